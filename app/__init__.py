@@ -6,7 +6,11 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
-from app.baserow_client import BaserowClient
+from app.baserow_client import configure_sessions
+from app.rate_limit import configure_rate_limits
+from app.table_directory import configure_table_directory
+from app.row_batches import configure_row_batches
+from app.row_export import configure_row_export
 
 db = SQLAlchemy()
 jwt = JWTManager()
@@ -14,7 +18,6 @@ bcrypt = Bcrypt()
 upload_dir = {
     'path': ''
 }
-client = BaserowClient()
 
 def create_app(config_class):
     """Create a Flask application"""
@@ -24,6 +27,19 @@ def create_app(config_class):
     upload_dir['path'] = app.config['UPLOAD_FOLDER']
     # print(app.config)
 
+    from app.xmi_reader import configure_cache, register_type_mappings
+    configure_cache(app.config['XMI_CACHE_SIZE'], app.config['XMI_CACHE_FOLDER'])
+    register_type_mappings(app.config['XMI_TYPE_MAPPINGS'])
+    configure_sessions(app.config['BASEROW_POOL_SIZE'], app.config['BASEROW_KEEP_ALIVE'])
+    configure_rate_limits(
+        app.config['BASEROW_RATE_LIMIT'],
+        app.config['BASEROW_BURST'],
+        app.config['BASEROW_MAX_RETRIES'],
+        app.config['BASEROW_BACKOFF'])
+    configure_table_directory(app.config['TABLE_DIRECTORY_TTL'])
+    configure_row_batches(app.config['ROW_BATCH_WORKERS'])
+    configure_row_export(app.config['EXPORT_PREFETCH_PAGES'])
+
     db.init_app(app)
     jwt.init_app(app)
     bcrypt.init_app(app)
@@ -31,6 +47,14 @@ def create_app(config_class):
     # if not os.path.exists(app.config['UPLOAD_FOLDER']):
     #     os.makedirs(app.config['UPLOAD_FOLDER'])
 
+    from app.jobs import configure_jobs, fail_abandoned_jobs, start_heartbeat
+    configure_jobs(app.config['GENERATION_JOBS'])
+    start_heartbeat(app)
+    with app.app_context():
+        fail_abandoned_jobs()
+    from app.row_import import configure_row_import
+    configure_row_import(app.config['IMPORT_JOBS'])
+
     from app.api import api as api_blueprint
     app.register_blueprint(api_blueprint, url_prefix='/api/v1')
 
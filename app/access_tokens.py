@@ -0,0 +1,117 @@
+"""
+Module for caching Baserow access tokens by the refresh token they were issued for.
+
+"""
+import base64
+import json
+import time
+from collections.abc import Callable
+from threading import Lock
+
+# Refresh access tokens this many seconds before they expire
+REFRESH_MARGIN = 60
+
+_tokens: dict[tuple[str, str], tuple[str, float]] = {}
+# Lock of every refresh token and the number of threads holding or waiting for it
+_locks: dict[tuple[str, str], tuple[Lock, int]] = {}
+_lock = Lock()
+
+
+def jwt_expiry(token: str) -> float | None:
+    """Returns the `exp` claim of the JWT or `None` if it can't be read"""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _cached(key: tuple[str, str]) -> str | None:
+    with _lock:
+        entry = _tokens.get(key)
+    if entry is None or entry[1] - REFRESH_MARGIN <= time.time():
+        return None
+    return entry[0]
+
+
+def _prune(now: float):
+    """Drop expired tokens and locks no thread holds or waits for. Call with `_lock` held."""
+    for key, (_, expiry) in list(_tokens.items()):
+        if expiry <= now:
+            del _tokens[key]
+    for key, (_, users) in list(_locks.items()):
+        if key not in _tokens and users == 0:
+            del _locks[key]
+
+
+def _acquire(key: tuple[str, str]) -> Lock:
+    """Returns the lock of the key, kept until every thread using it released it"""
+    with _lock:
+        key_lock, users = _locks.get(key, (None, 0))
+        key_lock = key_lock or Lock()
+        _locks[key] = (key_lock, users + 1)
+    return key_lock
+
+
+def _release(key: tuple[str, str]):
+    with _lock:
+        key_lock, users = _locks[key]
+        _locks[key] = (key_lock, users - 1)
+
+
+def get_access_token(host: str,
+                     refresh_token: str,
+                     refresh: Callable[[str], tuple[int, str | None]]
+) -> tuple[int, str | None]:
+    """Get a cached access token for the refresh token or refresh it.
+
+    Concurrent callers with the same refresh token wait for a single refresh.
+
+    Args:
+        host: Baserow host the token is used for
+        refresh_token: Baserow refresh token
+        refresh: called with the refresh token, returns a status code and a new
+            access token
+
+    Returns:
+        Status code of the refresh (200 for a cached token) and the access token
+    """
+    key = (host, refresh_token)
+    access_token = _cached(key)
+    if access_token is not None:
+        return 200, access_token
+
+    key_lock = _acquire(key)
+    try:
+        with key_lock:
+            # Another thread may have refreshed the token while this one was waiting
+            access_token = _cached(key)
+            if access_token is not None:
+                return 200, access_token
+
+            status_code, access_token = refresh(refresh_token)
+            expiry = jwt_expiry(access_token) if access_token else None
+            with _lock:
+                _prune(time.time())
+                if expiry is not None:
+                    _tokens[key] = (access_token, expiry)
+                else:
+                    _tokens.pop(key, None)
+            return status_code, access_token
+    finally:
+        _release(key)
+
+
+def forget(host: str, refresh_token: str, access_token: str | None = None):
+    """Drop the cached access token for the refresh token, e.g. after Baserow rejected it.
+
+    Given the rejected access token, a token another thread already refreshed
+    is kept. The lock of the refresh token is kept, so threads still refresh it
+    one at a time.
+    """
+    key = (host, refresh_token)
+    with _lock:
+        entry = _tokens.get(key)
+        if entry is not None and access_token in (None, entry[0]):
+            del _tokens[key]
@@ -9,4 +9,5 @@ from app.api import token
 from app.api import user
 from app.api import files
 from app.api import uml_model
-from app.api import row
\ No newline at end of file
+from app.api import row
+from app.api import baserow
\ No newline at end of file
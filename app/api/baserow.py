@@ -0,0 +1,12 @@
+"""Module for monitoring requests sent to Baserow"""
+from flask import jsonify
+from flask_jwt_extended import jwt_required
+from app.api import api
+from app.rate_limit import get_stats
+
+
+@api.get('/baserow/stats')
+@jwt_required()
+def get_baserow_stats():
+    """Get queue depth, in-flight requests and retries for every Baserow host"""
+    return jsonify(data=get_stats()), 200
@@ -52,6 +52,7 @@ def put_file(filename):
     path = os.path.join(path_to_filename, filename)
     with open(path, "wb") as file:
         file.write(request.data)
+    xr.invalidate(get_jwt_identity(), filename)
 
     return jsonify(msg="File added"), 200
 
@@ -67,6 +68,8 @@ def rename_file(filename):
         return jsonify(msg="Could not find file"), 404
     new_file = os.path.join(path_to_filename, new_filename)
     os.rename(path, new_file)
+    xr.invalidate(get_jwt_identity(), filename)
+    xr.invalidate(get_jwt_identity(), new_filename)
     return jsonify(msg="File successfully renamed"), 200
 
 
@@ -78,6 +81,7 @@ def delete_file(filename):
     if not os.path.isfile(path):
         return jsonify(msg="Could not find file"), 404
     os.remove(path)
+    xr.invalidate(get_jwt_identity(), filename)
     return "", 204
 
 
@@ -89,16 +93,13 @@ def read_xmi_file(filename):
     path = os.path.join(path_to_filename, filename)
     if not os.path.isfile(path):
         return jsonify(msg="Could not find file"), 404
-    packaged_elements = xr.get_packaged_elements(get_jwt_identity(), filename)
+    uml_model = xr.get_model(get_jwt_identity(), filename)
     data = {}
-    data['classes'] = xr.get_classes(packaged_elements)
-    data['data_types'] = xr.get_data_types(packaged_elements)
-    data['enumerations'] = xr.get_enumerations(packaged_elements)
-    data['associations'] = xr.get_associations(data['classes'])
-    data['attributes'] = xr.get_attributes(
-        data['classes'],
-        data['data_types'],
-        data['enumerations'])
+    data['classes'] = xr.get_classes(uml_model)
+    data['data_types'] = xr.get_data_types(uml_model)
+    data['enumerations'] = xr.get_enumerations(uml_model)
+    data['associations'] = xr.get_associations(uml_model)
+    data['attributes'] = xr.get_attributes(uml_model)
 
     data['classes'] = list(data['classes'])
     return jsonify(data=data), 200
@@ -2,6 +2,7 @@
 from flask import request, jsonify
 from flask_jwt_extended import jwt_required #, get_jwt_identity
 from sqlalchemy.exc import IntegrityError
+from app import db
 from app.api import api
 from app.models import IDPair
 from app.id_pairs_utils import model_found, find_class_id_for_table, find_table_id_for_class
@@ -69,7 +70,11 @@ def add_id_pair_in_model(model_id: int):
     if same_pair is not None:
         return jsonify(msg="Pair already exists"), 400
 
-    new_pair = create_id_pair(**pair)
+    try:
+        new_pair = create_id_pair(**pair)
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify(msg="Class or table already has a pair"), 400
     return jsonify(data=new_pair.to_dict()), 201
 
 
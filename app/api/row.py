@@ -1,41 +1,89 @@
 """Module for creating CRUD operations on table rows"""
+import os
 import requests
-from flask import request, jsonify
+from flask import Response, current_app, request, jsonify, send_file, url_for
 from flask_jwt_extended import jwt_required
 from app.api import api
-from app.models import UMLModel
-from app.exc import BadRequestException
+from app import rate_limit, row_export, row_import, table_directory
+from app.baserow_client import get_host, get_session
+from app.row_batches import batch_sender, send_batches
+from app.jobs import tables_changed_at
+from app.models import ImportJob, UMLModel
+from app.exc import BadRequestException, NotFoundException
 
+# Headers of Baserow responses passed through to the client
+PASS_THROUGH_HEADERS = (
+    'Content-Type', 'Content-Encoding', 'Content-Length', 'ETag', 'Last-Modified',
+    'Cache-Control', 'Vary', 'Retry-After'
+)
+CHUNK_SIZE = 64 * 1024
 
-def get_table_id(database_url, baserow_token, database_id, table_name):
-    """Get table id by name"""
-    url = f"{database_url}/api/database/tables/database/{database_id}/"
-    res = requests.get(
-        url,
-        headers={'Authorization': f'JWT {baserow_token}'},
-        timeout=None
-    )
-    if res.status_code != 200:
-        raise BadRequestException(res.json(), res.status_code)
 
-    data = res.json()
-    table_id = [table['id'] for table in data if table['name'] == table_name][0]
+def get_table_id(model: UMLModel, table_name: str) -> int:
+    """Get table id by name from the model's cached table directory
+
+    Raises:
+        BadRequestException: If tables can't be listed
+        NotFoundException: If the database has no table with the name
+    """
+    def list_tables() -> list[dict]:
+        url = f"{model.database_url}/api/database/tables/database/{model.database_id}/"
+        res = rate_limit.send(
+            get_session(model.database_url), get_host(model.database_url), "GET", url,
+            headers={'Authorization': f'JWT {model.baserow_token}'},
+            timeout=None
+        )
+        if res.status_code != 200:
+            raise BadRequestException(res.json(), res.status_code)
+        return res.json()
+
+    table_id = table_directory.get_table_id(
+        model.id, table_name, list_tables, tables_changed_at(model.id))
+    if table_id is None:
+        raise NotFoundException("Table not found")
     return table_id
 
 
+def upstream_headers(model: UMLModel) -> dict:
+    """Returns headers of a Baserow request passed through for the client, asking
+    for a compression the client accepts"""
+    return {
+        'Authorization': f'JWT {model.baserow_token}',
+        'Accept-Encoding': request.headers.get('Accept-Encoding', 'identity'),
+    }
+
+
+def send_upstream(model: UMLModel, method: str, url: str, **kwargs) -> requests.Response:
+    """Send a request for the client to Baserow over the pooled session of its
+    host, within its rate limit, streaming the response"""
+    return rate_limit.send(
+        get_session(model.database_url), get_host(model.database_url), method, url,
+        headers=upstream_headers(model),
+        timeout=None,
+        stream=True,
+        **kwargs)
+
+
+def pass_through(response: requests.Response) -> Response:
+    """Stream a Baserow response to the client without decoding it, keeping its
+    status, compression and content headers"""
+    headers = {name: response.headers[name]
+               for name in PASS_THROUGH_HEADERS if name in response.headers}
+    body = response.raw.stream(CHUNK_SIZE, decode_content=False)
+    proxied = Response(body, status=response.status_code, headers=headers)
+    proxied.call_on_close(response.close)
+    return proxied
+
+
 @api.get('/models/<model_id>/tables')
 @jwt_required()
 def get_all_tables(model_id):
     """Get all tables of a given model"""
     model = UMLModel.query.get_or_404(model_id)
     url = f"{model.database_url}/api/database/tables/database/{model.database_id}/"
-    response = requests.get(
-        url,
-        headers={'Authorization': f'JWT {model.baserow_token}'},
-        timeout=None
-    )
+    response = send_upstream(model, "GET", url)
 
-    return response.json(), response.status_code
+    return pass_through(response)
 
 
 @api.get('/models/<model_id>/tables/<table_name>')
@@ -44,14 +92,10 @@ def get_table_id_by_name(model_id, table_name):
     """Get table id by name"""
     model = UMLModel.query.get_or_404(model_id)
     try:
-        table_id = get_table_id(
-            model.database_url,
-            model.baserow_token,
-            model.database_id,
-            table_name)
+        table_id = get_table_id(model, table_name)
     except BadRequestException as exc:
         return exc.json, exc.status_code
-    if table_id is None:
+    except NotFoundException:
         return jsonify(msg="Table not found"), 404
 
     return jsonify(table_id=table_id), 200
@@ -63,23 +107,16 @@ def get_all_table_rows(model_id, table_name):
     """Get all table data"""
     model = UMLModel.query.get_or_404(model_id)
     try:
-        table_id = get_table_id(
-            model.database_url,
-            model.baserow_token,
-            model.database_id,
-            table_name)
+        table_id = get_table_id(model, table_name)
     except BadRequestException as exc:
         return exc.json, exc.status_code
+    except NotFoundException:
+        return jsonify(msg="Table not found"), 404
 
     url = f"{model.database_url}/api/database/rows/table/{table_id}/"
-    response = requests.get(
-        url,
-        headers={'Authorization': f'JWT {model.baserow_token}'},
-        params=request.query_string,
-        timeout=None
-    )
+    response = send_upstream(model, "GET", url, params=request.query_string)
 
-    return response.json(), response.status_code
+    return pass_through(response)
 
 
 @api.get('/models/<model_id>/data/<table_name>/<row_id>')
@@ -88,22 +125,16 @@ def get_row_by_id(model_id, table_name, row_id):
     """Get a row by id"""
     model = UMLModel.query.get_or_404(model_id)
     try:
-        table_id = get_table_id(
-            model.database_url,
-            model.baserow_token,
-            model.database_id,
-            table_name)
+        table_id = get_table_id(model, table_name)
     except BadRequestException as exc:
         return exc.json, exc.status_code
+    except NotFoundException:
+        return jsonify(msg="Table not found"), 404
 
     url = f"{model.database_url}/api/database/rows/table/{table_id}/{row_id}/?user_field_names=true"
-    response = requests.get(
-        url,
-        headers={'Authorization': f'JWT {model.baserow_token}'},
-        timeout=None
-    )
+    response = send_upstream(model, "GET", url)
 
-    return response.json(), response.status_code
+    return pass_through(response)
 
 
 @api.post('/models/<model_id>/data/<table_name>')
@@ -112,24 +143,20 @@ def create_row(model_id, table_name):
     """Create a new row"""
     model = UMLModel.query.get_or_404(model_id)
     try:
-        table_id = get_table_id(
-            model.database_url,
-            model.baserow_token,
-            model.database_id,
-            table_name)
+        table_id = get_table_id(model, table_name)
     except BadRequestException as exc:
         return exc.json, exc.status_code
+    except NotFoundException:
+        return jsonify(msg="Table not found"), 404
 
     url = f"{model.database_url}/api/database/rows/table/{table_id}/?user_field_names=true"
-    response = requests.post(
-        url,
-        headers={'Authorization': f'JWT {model.baserow_token}'},
+    response = send_upstream(
+        model, "POST", url,
         json=request.json,
         # params=request.query_string,
-        timeout=None
     )
 
-    return response.json(), response.status_code
+    return pass_through(response)
 
 
 @api.patch('/models/<model_id>/data/<table_name>/<row_id>')
@@ -138,23 +165,16 @@ def update_row(model_id, table_name, row_id):
     """Update a row"""
     model = UMLModel.query.get_or_404(model_id)
     try:
-        table_id = get_table_id(
-            model.database_url,
-            model.baserow_token,
-            model.database_id,
-            table_name)
+        table_id = get_table_id(model, table_name)
     except BadRequestException as exc:
         return exc.json, exc.status_code
+    except NotFoundException:
+        return jsonify(msg="Table not found"), 404
 
     url = f"{model.database_url}/api/database/rows/table/{table_id}/{row_id}/?user_field_names=true"
-    response = requests.patch(
-        url,
-        headers={'Authorization': f'JWT {model.baserow_token}'},
-        json=request.json,
-        timeout=None
-    )
+    response = send_upstream(model, "PATCH", url, json=request.json)
 
-    return response.json(), response.status_code
+    return pass_through(response)
 
 
 @api.delete('/models/<model_id>/data/<table_name>/<row_id>')
@@ -163,32 +183,182 @@ def delete_row(model_id, table_name, row_id):
     """Delete a row"""
     model = UMLModel.query.get_or_404(model_id)
     try:
-        table_id = get_table_id(
-            model.database_url,
-            model.baserow_token,
-            model.database_id,
-            table_name)
+        table_id = get_table_id(model, table_name)
     except BadRequestException as exc:
         return exc.json, exc.status_code
+    except NotFoundException:
+        return jsonify(msg="Table not found"), 404
 
+    # A missing row is reported by the delete itself
     url = f"{model.database_url}/api/database/rows/table/{table_id}/{row_id}/"
-    response = requests.get(
-        url,
-        headers={'Authorization': f'JWT {model.baserow_token}'},
-        timeout=None
-    )
-    if response.status_code != 200:
-        return response.json(), response.status_code
-    # deleted_row = response.json()
+    response = send_upstream(model, "DELETE", url)
 
-    url = f"{model.database_url}/api/database/rows/table/{table_id}/{row_id}/"
-    response = requests.delete(
-        url,
-        headers={'Authorization': f'JWT {model.baserow_token}'},
-        timeout=None
-    )
+    return pass_through(response)
+
+
+def batch_response(results: list[dict]):
+    """Returns results of every item with the number of succeeded and failed items"""
+    failed = sum(1 for result in results if 'error' in result)
+    return jsonify(data=results, succeeded=len(results) - failed, failed=failed), 200
+
+
+def batch_items(key: str = 'items') -> list | None:
+    """Get the list of items from the request body or `None` if it's missing"""
+    items = (request.get_json(silent=True) or {}).get(key)
+    return items if isinstance(items, list) else None
+
+
+@api.post('/models/<model_id>/data/<table_name>/batch')
+@jwt_required()
+def create_rows(model_id, table_name):
+    """Create many rows with batch requests, reporting the result of every row"""
+    model = UMLModel.query.get_or_404(model_id)
+    items = batch_items()
+    if items is None:
+        return jsonify(msg="List of items required"), 400
+    try:
+        table_id = get_table_id(model, table_name)
+    except BadRequestException as exc:
+        return exc.json, exc.status_code
+    except NotFoundException:
+        return jsonify(msg="Table not found"), 404
+
+    url = f"{model.database_url}/api/database/rows/table/{table_id}/batch/?user_field_names=true"
+    send = batch_sender(model.database_url, model.baserow_token, "POST", url)
+    return batch_response(send_batches(send, items))
+
+
+@api.patch('/models/<model_id>/data/<table_name>/batch')
+@jwt_required()
+def update_rows(model_id, table_name):
+    """Update many rows with batch requests, reporting the result of every row"""
+    model = UMLModel.query.get_or_404(model_id)
+    items = batch_items()
+    if items is None:
+        return jsonify(msg="List of items required"), 400
+    try:
+        table_id = get_table_id(model, table_name)
+    except BadRequestException as exc:
+        return exc.json, exc.status_code
+    except NotFoundException:
+        return jsonify(msg="Table not found"), 404
 
-    if response.status_code != 204:
-        return response.json(), response.status_code
+    url = f"{model.database_url}/api/database/rows/table/{table_id}/batch/?user_field_names=true"
+    send = batch_sender(model.database_url, model.baserow_token, "PATCH", url)
+    return batch_response(send_batches(send, items))
+
+
+@api.delete('/models/<model_id>/data/<table_name>/batch')
+@jwt_required()
+def delete_rows(model_id, table_name):
+    """Delete many rows by id with batch requests, reporting the result of every row"""
+    model = UMLModel.query.get_or_404(model_id)
+    items = batch_items()
+    if items is None:
+        return jsonify(msg="List of row ids required"), 400
+    try:
+        table_id = get_table_id(model, table_name)
+    except BadRequestException as exc:
+        return exc.json, exc.status_code
+    except NotFoundException:
+        return jsonify(msg="Table not found"), 404
+
+    url = f"{model.database_url}/api/database/rows/table/{table_id}/batch-delete/"
+    send = batch_sender(model.database_url, model.baserow_token, "POST", url)
+    return batch_response(send_batches(send, items))
+
+
+@api.get('/models/<model_id>/data/<table_name>/export')
+@jwt_required()
+def export_table_rows(model_id, table_name):
+    """Stream every row of a table as NDJSON or CSV"""
+    model = UMLModel.query.get_or_404(model_id)
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in row_export.FORMATS:
+        return jsonify(msg="Format must be ndjson or csv"), 400
+    try:
+        table_id = get_table_id(model, table_name)
+        get = row_export.table_reader(model.database_url, model.baserow_token)
+        lines = row_export.export_table(get, table_id, export_format)
+    except BadRequestException as exc:
+        return exc.json, exc.status_code
+    except NotFoundException:
+        return jsonify(msg="Table not found"), 404
+
+    return Response(lines, mimetype=row_export.FORMATS[export_format], headers={
+        'Content-Disposition': f'attachment; filename="{table_name}.{export_format}"'})
+
+
+@api.get('/models/<model_id>/export')
+@jwt_required()
+def export_database_rows(model_id):
+    """Stream every row of every table in the model's database as NDJSON"""
+    model = UMLModel.query.get_or_404(model_id)
+    if request.args.get('format', 'ndjson') != 'ndjson':
+        return jsonify(msg="Databases can only be exported as ndjson"), 400
+    try:
+        get = row_export.table_reader(model.database_url, model.baserow_token)
+        lines = row_export.export_database(get, model.database_id)
+    except BadRequestException as exc:
+        return exc.json, exc.status_code
+
+    return Response(lines, mimetype=row_export.FORMATS['ndjson'], headers={
+        'Content-Disposition': f'attachment; filename="{model.database_name}.ndjson"'})
+
+
+@api.post('/models/<model_id>/data/<table_name>/import')
+@jwt_required()
+def import_rows(model_id, table_name):
+    """Import rows from a CSV or NDJSON request body in the background"""
+    model = UMLModel.query.get_or_404(model_id)
+    file_format = request.args.get('format', 'csv')
+    if file_format not in row_import.IMPORT_FORMATS:
+        return jsonify(msg="Format must be csv or ndjson"), 400
+    try:
+        table_id = get_table_id(model, table_name)
+        get = row_export.table_reader(model.database_url, model.baserow_token)
+        fields = get(f"database/fields/table/{table_id}/")
+    except BadRequestException as exc:
+        return exc.json, exc.status_code
+    except NotFoundException:
+        return jsonify(msg="Table not found"), 404
+
+    columns = row_import.import_columns(model, table_name, fields)
+    path = row_import.save_upload(request.stream, model.user_id, file_format)
+    if file_format == 'csv':
+        unusable = row_import.unusable_columns(path, columns)
+        if unusable:
+            os.remove(path)
+            return jsonify(msg="Columns don't match writable fields", columns=unusable), 400
+
+    url = f"{model.database_url}/api/database/rows/table/{table_id}/batch/?user_field_names=true"
+    send = batch_sender(model.database_url, model.baserow_token, "POST", url)
+    job = row_import.submit_import(
+        current_app._get_current_object(), model, table_name, file_format, path, send, columns)
+
+    location = url_for('api.get_import_job', model_id=model.id, job_id=job.id)
+    return jsonify(data=job.to_dict()), 202, {'Location': location}
+
+
+@api.get('/models/<model_id>/imports/<int:job_id>')
+@jwt_required()
+def get_import_job(model_id, job_id: int):
+    """Get progress and number of failed rows of an import"""
+    job = ImportJob.query.filter_by(id=job_id, uml_model_id=model_id).first()
+    if job is None:
+        return jsonify(msg="Import not found"), 404
+
+    return jsonify(data=job.to_dict()), 200
+
+
+@api.get('/models/<model_id>/imports/<int:job_id>/report')
+@jwt_required()
+def get_import_report(model_id, job_id: int):
+    """Download the rows of an import that couldn't be imported as NDJSON"""
+    model = UMLModel.query.get_or_404(model_id)
+    job = ImportJob.query.filter_by(id=job_id, uml_model_id=model.id).first()
+    path = row_import.report_path(model.user_id, job_id)
+    if job is None or not os.path.isfile(path):
+        return jsonify(msg="Report not found"), 404
 
-    return "", response.status_code
+    return send_file(path, mimetype=row_export.FORMATS['ndjson'], as_attachment=True)
@@ -2,27 +2,31 @@
 Module for creating CRUD operations on UML models.
 
 """
-from flask import request, jsonify
+from flask import request, jsonify, current_app, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.exc import IntegrityError
-from app import db
+from app import db, table_directory
 from app.api import api
-from app.models import IDPair, UMLModel
+from app.models import GenerationJob, ImportJob, UMLModel
 from app.baserow_init import (
-    create_baserow_database,
+    # create_baserow_database,
     # update_baserow_database,
     delete_baserow_database
 )
+from app.jobs import fail_abandoned_jobs, submit_generation
+from app.planner import plan_generation
+from app.journal import clear_journal
 # from app.api.id_pair import model_found, delete_id_pair_in_model, create_id_pair_in_model
 from app.exc import (
+    ActiveJobException,
     NotFoundException,
     NotAuthorizedException,
     InvalidGroupException,
     InvalidDatabaseException,
-    BadFieldException,
+    MissingDatabaseException,
     DeletingDatabasesException
 )
-from app.id_pairs_utils import delete_id_pair, model_found
+from app.id_pairs_utils import delete_id_pairs, model_found
 
 # def generate_db(model):
 #     """Helper function to generate database"""
@@ -103,7 +107,7 @@ def get_model_by_id(model_id):
 @api.post('/models')
 @jwt_required()
 def post_model():
-    """Create a new one"""
+    """Create a new one and generate its database in the background"""
     model_dict = {
         'user_id': get_jwt_identity(),
         'database_url': request.json.get('database_url', 'https://api.baserow.io'),
@@ -117,35 +121,108 @@ def post_model():
         db.session.add(model)
         db.session.commit()
 
-        database_id = create_baserow_database(model)
-
-        print("Database created successfully:", database_id)
-        # print("ID pairs:")
-        # print(id_pairs)
-
-        # Add database id after it was created
-        model.database_id = database_id
-        db.session.commit()
-        # response = refresh_list_id_pairs_in_model(model.user_id, model.id, id_pairs)
-        # if response:
-        #     return response
-    except NotAuthorizedException:
-        db.session.rollback()
-        return jsonify(msg="Unauthorized to connect to Baserow"), 403
-    except InvalidGroupException:
-        db.session.rollback()
-        return jsonify(msg="Baserow group invalid"), 400
-    except InvalidDatabaseException:
-        db.session.rollback()
-        return jsonify(msg="Baserow database invalid"), 400
-    except BadFieldException:
-        db.session.rollback()
-        return jsonify(msg="Error while creating a field"), 400
+        # Database id is added to the model by the job after it was created
+        job = submit_generation(current_app._get_current_object(), model)
     except IntegrityError:
         db.session.rollback()
         return jsonify(msg="Integrity error"), 400
 
-    return jsonify(data=model.to_dict()), 201
+    location = url_for('api.get_model_job', model_id=model.id, job_id=job.id)
+    return jsonify(data=model.to_dict(), job=job.to_dict()), 202, {'Location': location}
+
+
+@api.post('/models/plan')
+@jwt_required()
+def plan_model():
+    """Get Baserow calls and an estimated duration of generating a database,
+    without calling Baserow"""
+    try:
+        plan = plan_generation(
+            get_jwt_identity(),
+            request.json.get('filename'),
+            request.json.get('database_url', 'https://api.baserow.io'))
+    except KeyError:
+        return jsonify(msg="XMI file not specified"), 400
+    except FileNotFoundError:
+        return jsonify(msg="XMI file not found"), 404
+
+    return jsonify(data=plan), 200
+
+
+@api.get('/models/<model_id>/jobs/<int:job_id>')
+@jwt_required()
+def get_model_job(model_id, job_id: int):
+    """Get phase, progress and errors of a database generation"""
+    try:
+        model_found(model_id)
+    except NotFoundException:
+        return jsonify(msg="Model not found"), 404
+
+    job = GenerationJob.query.filter_by(id=job_id, uml_model_id=model_id).first()
+    if job is None:
+        return jsonify(msg="Job not found"), 404
+
+    return jsonify(data=job.to_dict()), 200
+
+
+@api.post('/models/<model_id>/resume')
+@jwt_required()
+def resume_model(model_id):
+    """Continue a failed generation, skipping the steps it already finished, or
+    run a failed sync again"""
+    try:
+        model = model_found(model_id)
+    except NotFoundException:
+        return jsonify(msg="Model not found"), 404
+
+    fail_abandoned_jobs(model.id)
+
+    last_job = GenerationJob.query.filter_by(uml_model_id=model.id) \
+        .order_by(GenerationJob.id.desc()).first()
+    # Models generated before jobs were recorded already have their database
+    if last_job is None:
+        return jsonify(msg="Nothing to resume"), 409
+    if last_job.status != 'failed':
+        return jsonify(msg=f"Generation is {last_job.status}"), 409
+
+    # A failed sync is synced again, never generated into a new database
+    try:
+        job = submit_generation(current_app._get_current_object(), model, last_job.kind)
+    except ActiveJobException:
+        return jsonify(msg="Generation is already queued or running"), 409
+    location = url_for('api.get_model_job', model_id=model.id, job_id=job.id)
+    return jsonify(data=model.to_dict(), job=job.to_dict()), 202, {'Location': location}
+
+
+@api.post('/models/<model_id>/sync')
+@jwt_required()
+def sync_model(model_id):
+    """Apply changes of the model's XMI file to its database, changing only what differs"""
+    try:
+        model = model_found(model_id)
+    except NotFoundException:
+        return jsonify(msg="Model not found"), 404
+
+    fail_abandoned_jobs(model.id)
+
+    if model.database_id is None:
+        return jsonify(msg="Database not generated"), 409
+    last_job = GenerationJob.query.filter_by(uml_model_id=model.id) \
+        .order_by(GenerationJob.id.desc()).first()
+    if last_job is not None and last_job.status in ('queued', 'running'):
+        return jsonify(msg=f"Generation is {last_job.status}"), 409
+    # Tables of a failed generation have no ID pairs yet and would be created again
+    last_generation = GenerationJob.query.filter_by(uml_model_id=model.id, kind='generation') \
+        .order_by(GenerationJob.id.desc()).first()
+    if last_generation is not None and last_generation.status == 'failed':
+        return jsonify(msg="Generation failed, resume it with /resume"), 409
+
+    try:
+        job = submit_generation(current_app._get_current_object(), model, 'sync')
+    except ActiveJobException:
+        return jsonify(msg="Generation is already queued or running"), 409
+    location = url_for('api.get_model_job', model_id=model.id, job_id=job.id)
+    return jsonify(data=model.to_dict(), job=job.to_dict()), 202, {'Location': location}
 
 
 @api.patch('/models/<model_id>')
@@ -213,19 +290,35 @@ def delete_model(model_id):
     """Delete a model by ID"""
     try:
         model = model_found(model_id)
-        db.session.delete(model)
-        db.session.commit()
-        delete_baserow_database(model)
-        id_pairs = IDPair.query.filter_by(uml_model_id=model_id).all()
-        for pair in id_pairs:
-            delete_id_pair(pair)
-        # response = refresh_list_id_pairs_in_model(get_jwt_identity(), model.id, [])
-        # if response[1] != 200:
-        #    return response[0]
     except NotFoundException:
         return jsonify(msg="Model not found"), 404
-    except DeletingDatabasesException:
-        db.session.rollback()
-        return jsonify(msg="Unable to delete model"), 400
+
+    fail_abandoned_jobs(model.id)
+
+    # Running jobs would keep writing to the deleted model and its database
+    active_jobs = (GenerationJob.query.filter_by(uml_model_id=model.id)
+                   .filter(GenerationJob.status.in_(('queued', 'running'))).count()
+                   + ImportJob.query.filter_by(uml_model_id=model.id)
+                   .filter(ImportJob.status.in_(('queued', 'running'))).count())
+    if active_jobs:
+        return jsonify(msg="Model has a queued or running job"), 409
+
+    # Delete the Baserow database first, so a failure leaves the model in place
+    if model.database_id is not None:
+        try:
+            delete_baserow_database(model)
+        except MissingDatabaseException:
+            print(f"Database {model.database_id} of model {model.id} no longer exists")
+        except (NotAuthorizedException, InvalidGroupException, InvalidDatabaseException,
+                DeletingDatabasesException):
+            return jsonify(msg="Unable to delete model"), 400
+
+    GenerationJob.query.filter_by(uml_model_id=model.id).delete()
+    ImportJob.query.filter_by(uml_model_id=model.id).delete()
+    clear_journal(model.id, commit=False)
+    delete_id_pairs(model.id, commit=False)
+    db.session.delete(model)
+    db.session.commit()
+    table_directory.invalidate(model.id)
 
     return "", 204
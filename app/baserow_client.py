@@ -2,24 +2,107 @@
 Module with a class for easily sending responses to the Baserow.
 
 """
+import atexit
+from threading import Lock
+from urllib.parse import urlsplit
 import requests
+from requests.adapters import HTTPAdapter
+from app import access_tokens, rate_limit
 
 URL = 'https://api.baserow.io'
 
 BR_URL = f"{URL}/api/"
 
+_session_settings = {
+    'pool_size': 10,
+    'keep_alive': True,
+}
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = Lock()
+
+
+def configure_sessions(pool_size: int = 10, keep_alive: bool = True):
+    """Set the connection pool size and keep-alive of sessions. Closes open sessions."""
+    close_sessions()
+    _session_settings['pool_size'] = pool_size
+    _session_settings['keep_alive'] = keep_alive
+
+
+def get_host(url: str) -> str:
+    """Returns the scheme and location of the given URL"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_session(url: str) -> requests.Session:
+    """Returns a pooled session for the host of the given URL, shared by all threads"""
+    host = get_host(url)
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=_session_settings['pool_size'])
+            session.mount(f"{host}/", adapter)
+            if not _session_settings['keep_alive']:
+                session.headers['Connection'] = 'close'
+            _sessions[host] = session
+        return session
+
+
+def close_sessions():
+    """Close all pooled sessions and their connections"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+atexit.register(close_sessions)
+
+
 class BaserowClient:
     """
     A client for managing Baserow operations with requests.
     
     """
-    def __init__(self):
+    def __init__(self, url: str = URL):
+        self.__base_url__ = url
+        self.__url__ = f"{url}/api/"
         self.__token_status__ = None
         self.__access_token__ = None
         self.__refresh_token__ = None
         self.__get_headers__ = None
         self.__post_patch_headers__ = None
 
+    @property
+    def session(self) -> requests.Session:
+        """Pooled session for the Baserow host of this client"""
+        return get_session(self.__base_url__)
+
+    def send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request within the rate limit of the Baserow host.
+
+        If Baserow rejects a cached access token, the token is refreshed and the
+        request is sent once more.
+        """
+        host = get_host(self.__base_url__)
+        response = rate_limit.send(self.session, host, method, url, **kwargs)
+        headers = kwargs.get('headers') or {}
+        if response.status_code != 401 or 'Authorization' not in headers \
+                or self.__refresh_token__ is None:
+            return response
+
+        rejected = headers['Authorization'].removeprefix("JWT ")
+        access_tokens.forget(host, self.__refresh_token__, rejected)
+        self.new_session_token(self.__refresh_token__)
+        if not self.is_token_valid():
+            return response
+        response.close()
+        kwargs['headers'] = {**headers, 'Authorization': f"JWT {self.__access_token__}"}
+        return rate_limit.send(self.session, host, method, url, **kwargs)
+
     def new_session_email(self, email, password):
         """Create a new session with email and password."""
         token_response = self.token_auth(email, password)
@@ -34,11 +117,13 @@ class BaserowClient:
             }
 
     def new_session_token(self, refresh_token):
-        """Create a new session with the refresh token."""
-        token_response = self.token_refresh(refresh_token)
-        self.__token_status__ = token_response.status_code
+        """Create a new session with the refresh token, reusing its cached access token."""
+        self.__token_status__, access_token = access_tokens.get_access_token(
+            get_host(self.__base_url__),
+            refresh_token,
+            self.refresh_access_token)
         if self.is_token_valid():
-            self.__access_token__ = token_response.json()["access_token"]
+            self.__access_token__ = access_token
             self.__refresh_token__ = refresh_token
             self.__get_headers__ = {"Authorization": f"JWT {self.__access_token__}"}
             self.__post_patch_headers__ = {
@@ -46,6 +131,13 @@ class BaserowClient:
                 "Content-Type": "application/json"
             }
 
+    def refresh_access_token(self, refresh_token: str) -> tuple[int, str | None]:
+        """Returns a status code and a new access token for the refresh token"""
+        token_response = self.token_refresh(refresh_token)
+        if token_response.status_code != 200:
+            return token_response.status_code, None
+        return token_response.status_code, token_response.json()["access_token"]
+
     def is_token_valid(self):
         """Returns `True` if a token status code is 200 otherwise `False`"""
         return self.__token_status__ == 200
@@ -56,15 +148,17 @@ class BaserowClient:
 
     def token_auth(self, email: str, password: str):
         """Returns a response to a newly created token authentication for a user"""
-        return requests.post(
-            f"{BR_URL}user/token-auth/",
+        return self.send(
+            "POST",
+            f"{self.__url__}user/token-auth/",
             json={"email": email, "password": password},
             timeout=None)
 
     def token_refresh(self, refresh_token: str):
         """Returns a response of a refreshed token"""
-        return requests.post(
-            f"{BR_URL}user/token-refresh/",
+        return self.send(
+            "POST",
+            f"{self.__url__}user/token-refresh/",
             json={"refresh_token": refresh_token},
             timeout=None)
 
@@ -77,7 +171,11 @@ class BaserowClient:
 
     def list_groups(self):
         """Returns a response to a list of groups"""
-        return requests.get(f"{BR_URL}groups/", headers=self.__get_headers__, timeout=None)
+        return self.send(
+            "GET",
+            f"{self.__url__}groups/",
+            headers=self.__get_headers__,
+            timeout=None)
 
     # def create_group(self, name: str):
     #     """Returns a response to a newly created group"""
@@ -93,23 +191,52 @@ class BaserowClient:
 
     def create_application(self, group_id: int, name: str, app_type: str):
         """Returns a response to a newly created application"""
-        return requests.post(
-            f"{BR_URL}applications/group/{group_id}/",
+        return self.send(
+            "POST",
+            f"{self.__url__}applications/group/{group_id}/",
             headers=self.__post_patch_headers__,
             json={"name": name, "type": app_type},
             timeout=None)
 
     def get_application(self, application_id: int):
         """Returns a response to a newly created application (database)"""
-        return requests.get(
-            f"{BR_URL}applications/{application_id}/",
+        return self.send(
+            "GET",
+            f"{self.__url__}applications/{application_id}/",
             headers=self.__get_headers__,
             timeout=None)
 
     def delete_application(self, application_id: int):
         """Returns a response to delete an application (database)"""
-        return requests.delete(
-            f"{BR_URL}applications/{application_id}/",
+        return self.send(
+            "DELETE",
+            f"{self.__url__}applications/{application_id}/",
+            headers=self.__get_headers__,
+            timeout=None)
+
+    def update_application(self, application_id: int, name: str):
+        """Returns a response to a renamed application (database)"""
+        return self.send(
+            "PATCH",
+            f"{self.__url__}applications/{application_id}/",
+            headers=self.__post_patch_headers__,
+            json={"name": name},
+            timeout=None)
+
+    def duplicate_application(self, application_id: int):
+        """Returns a response to a started job duplicating an application (database)"""
+        return self.send(
+            "POST",
+            f"{self.__url__}applications/{application_id}/duplicate/async/",
+            headers=self.__post_patch_headers__,
+            json={},
+            timeout=None)
+
+    def get_job(self, job_id: int):
+        """Returns a response to the state of a job"""
+        return self.send(
+            "GET",
+            f"{self.__url__}jobs/{job_id}/",
             headers=self.__get_headers__,
             timeout=None)
 
@@ -122,45 +249,51 @@ class BaserowClient:
 
     def list_database_tables(self, database_id: int):
         """Returns a response to a list of tables in a given database"""
-        return requests.get(
-            f"{BR_URL}database/tables/database/{database_id}/",
+        return self.send(
+            "GET",
+            f"{self.__url__}database/tables/database/{database_id}/",
             headers=self.__get_headers__,
             timeout=None)
 
     def get_database_table(self, table_id: int):
         """Return a response to a database table"""
-        return requests.get(
-            f"{BR_URL}database/tables/{table_id}/",
+        return self.send(
+            "GET",
+            f"{self.__url__}database/tables/{table_id}/",
             headers=self.__get_headers__,
             timeout=None)
 
     def create_database_table(self, database_id: int, table: object):
         """Returns a response to a newly created table"""
-        return requests.post(
-            f"{BR_URL}database/tables/database/{database_id}/",
+        return self.send(
+            "POST",
+            f"{self.__url__}database/tables/database/{database_id}/",
             headers=self.__post_patch_headers__,
             json=table,
             timeout=None)
 
     def update_database_table(self, table_id: int, name: str):
         """Return a response to a newly updated table"""
-        return requests.patch(
-            f"{BR_URL}database/tables/{table_id}/",
+        return self.send(
+            "PATCH",
+            f"{self.__url__}database/tables/{table_id}/",
             headers=self.__post_patch_headers__,
             json={"name": name},
             timeout=None)
 
     def delete_database_table(self, table_id: int):
         """Returns a response to a deleted table"""
-        return requests.delete(
-            f"{BR_URL}database/tables/{table_id}/",
+        return self.send(
+            "DELETE",
+            f"{self.__url__}database/tables/{table_id}/",
             headers=self.__get_headers__,
             timeout=None)
 
     def create_database_table_field(self, table_id: int, field: object):
         """Returns a response to a newly created table field"""
-        return requests.post(
-            f"{BR_URL}database/fields/table/{table_id}/",
+        return self.send(
+            "POST",
+            f"{self.__url__}database/fields/table/{table_id}/",
             headers=self.__post_patch_headers__,
             json=field,
             timeout=None)
@@ -174,16 +307,26 @@ class BaserowClient:
 
     def update_database_table_field(self, field_id: int, field: object):
         """Returns a response to an updated field found by id"""
-        return requests.patch(
-            f"{BR_URL}database/fields/{field_id}/",
+        return self.send(
+            "PATCH",
+            f"{self.__url__}database/fields/{field_id}/",
             headers=self.__post_patch_headers__,
             json=field,
             timeout=None)
 
+    def delete_database_table_field(self, field_id: int):
+        """Returns a response to a deleted field found by id"""
+        return self.send(
+            "DELETE",
+            f"{self.__url__}database/fields/{field_id}/",
+            headers=self.__get_headers__,
+            timeout=None)
+
     def list_database_table_fields(self, table_id: int):
         """Returns a response to a list of all fields found in a table"""
-        return requests.get(
-            f"{BR_URL}database/fields/table/{table_id}/",
+        return self.send(
+            "GET",
+            f"{self.__url__}database/fields/table/{table_id}/",
             headers=self.__get_headers__,
             timeout=None)
 
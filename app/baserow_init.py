@@ -1,23 +1,40 @@
 """Generate a Baserow database"""
+from collections import Counter
+from collections.abc import Callable
+from functools import partial
+from flask import current_app
+from app import db
 from app.models import UMLModel
 import app.xmi_reader as xr
-from app import client
+from app.baserow_client import URL, BaserowClient
+from app.scheduler import Scheduler
 from app.exc import (
     NotAuthorizedException,
     InvalidGroupException,
     InvalidDatabaseException,
+    MissingDatabaseException,
     BadFieldException,
     DeletingDatabasesException
 )
 from app.id_pairs_utils import (
     # find_class_id_for_table,
-    find_table_id_for_class,
-    create_id_pair,
+    create_id_pairs,
     # delete_id_pair
 )
+from app.journal import load_journal, record_step, clear_journal
+from app.database_templates import template_key, find_template, clone_template, save_template
 
+FIELD_EXISTS_ERROR = "ERROR_FIELD_WITH_SAME_NAME_ALREADY_EXISTS"
+PRIMARY_FIELD = "Primary key"
 
-def validate_group(_group_id: int) -> int:
+
+def new_client(model: UMLModel) -> BaserowClient:
+    """Create a client with its own credentials for the Baserow instance of the model.
+    Clients of the same instance share its connection pool."""
+    return BaserowClient(model.database_url or URL)
+
+
+def validate_group(client: BaserowClient, _group_id: int) -> int:
     """Check if the user has a group with the id provided in env file"""
     group_response = client.list_groups()
 
@@ -27,18 +44,20 @@ def validate_group(_group_id: int) -> int:
         raise InvalidGroupException(f"Group with id {_group_id} not found")
 
 
-def validate_database(_database_id: int) -> int:
+def validate_database(client: BaserowClient, _database_id: int) -> int:
     """Validate the database"""
     database_response = client.get_application(_database_id)
+    if database_response.status_code == 404:
+        raise MissingDatabaseException(database_response.json())
     if database_response.status_code != 200:
         raise InvalidDatabaseException(database_response.json())
 
 
-def create_database(_group_id: int, _database_name: str) -> int:
+def create_database(client: BaserowClient, _group_id: int, _database_name: str) -> int:
     """Get application by ID"""
     print(f"Creating new database {_database_name}")
     database = client.create_application(_group_id, _database_name, "database").json()
-    validate_database(int(database['id']))
+    validate_database(client, int(database['id']))
     return int(database['id'])
 
 
@@ -71,27 +90,88 @@ def create_database(_group_id: int, _database_name: str) -> int:
 #     return client.update_database_table_field(field_id, _field).json()
 
 
-def create_tables(model_id: int, classes: dict, database_id: int, attributes: dict):
-    """Generate tables"""
-    for id_, class_ in classes.items():
-        class_name = xr.get_class_name(class_)
-
-        # Creating a new table
-        new_table = client.create_database_table(database_id, {
-            "name": class_name,
-            "data": [["Primary key"]],
-            "first_row_header": True
-        }).json()
+def split_header_fields(fields: list[dict]) -> tuple[list[str], list[dict]]:
+    """Split fields into names of plain text fields created as header columns of
+    their table and fields that need their own call.
+
+    Fields sharing a name stay separate, so the table is created even if Baserow
+    rejects one of them.
+    """
+    counts = Counter(field['name'] for field in fields)
+    header, separate = [], []
+    for field in fields:
+        if field.get('type') == "text" and field.keys() <= {'name', 'type'} \
+                and counts[field['name']] == 1 and field['name'] != PRIMARY_FIELD:
+            header.append(field['name'])
+        else:
+            separate.append(field)
+    return header, separate
+
+
+def create_table(client: BaserowClient,
+                 database_id: int,
+                 class_name: str,
+                 field_names: list[str] = ()) -> int:
+    """Generate a new table with a primary key and text fields of the given names"""
+    table_response = client.create_database_table(database_id, {
+        "name": class_name,
+        "data": [[PRIMARY_FIELD, *field_names]],
+        "first_row_header": True
+    })
+    new_table = table_response.json()
 
-        print(f"Table ID: {new_table['id']}")
-        print(f"Created table {new_table['name']} with a primary key")
-
-        # Save class and table ids in DB
-        create_id_pair(uml_model_id=model_id, class_id=id_, table_id=new_table['id'])
-
-        # Create fields for the table
-        for field in attributes[id_]:
-            create_field(field, new_table['id'])
+    # Checking for errors
+    if table_response.status_code != 200:
+        raise BadFieldException(new_table)
+
+    print(f"Table ID: {new_table['id']}")
+    print(f"Created table {new_table['name']} with a primary key")
+    return new_table['id']
+
+
+def create_tables(client: BaserowClient,
+                  scheduler: Scheduler,
+                  model_id: int,
+                  classes: dict,
+                  database_id: int,
+                  attributes: dict,
+                  journal: dict):
+    """Schedule tables and their fields, each field after its table.
+    Plain text fields are created together with their table.
+    Tables and fields recorded in the journal are skipped."""
+    for id_, class_ in classes.items():
+        header, fields = split_header_fields(attributes[id_])
+        resumed = ("table", id_) in journal
+        if resumed:
+            scheduler.complete(("table", id_), journal[("table", id_)])
+        else:
+            # Tables are committed to the journal right away, so a resumed
+            # generation never creates them twice
+            def save_table(table_id: int, class_id: str = id_):
+                record_step(model_id, "table", class_id, table_id)
+
+            scheduler.add(
+                ("table", id_),
+                create_table, client, database_id, xr.get_class_name(class_), header,
+                on_done=save_table)
+
+        # Create the remaining fields for the table
+        for index, field in enumerate(fields):
+            key = f"{id_}:{field['name']}"
+            if ("field", key) in journal:
+                continue
+
+            # Committed with the next progress update, an existing field is tolerated
+            # when resuming
+            def save_field(field_id: int | None, key: str = key):
+                record_step(model_id, "field", key, field_id, commit=False)
+
+            # Fields of a table from an earlier attempt may exist without being recorded
+            scheduler.add(
+                ("field", id_, index),
+                partial(create_field, exists_ok=resumed), client, field,
+                after=[("table", id_)],
+                on_done=save_field)
 
 
 # def generate_tables(classes: dict, database_id: int, attributes: dict, id_pairs: list) -> list:
@@ -139,50 +219,90 @@ def create_tables(model_id: int, classes: dict, database_id: int, attributes: di
 #     return id_pairs
 
 
-def create_field(field: dict, table_id: int):
-    """Generate a new field"""
+def create_field(client: BaserowClient, field: dict, table_id: int, exists_ok=False
+) -> int | None:
+    """Generate a new field. Returns its id or `None` if it already exists and
+    `exists_ok` is set."""
     print(field)
     print(table_id)
     field_response = client.create_database_table_field(table_id, field)
     new_field = field_response.json()
 
     # Checking for errors
+    if exists_ok and new_field.get('error') == FIELD_EXISTS_ERROR:
+        print(f"Field {field['name']} already exists")
+        return None
     if field_response.status_code != 200:
         raise BadFieldException(new_field)
     print(f"Created new field {new_field['id']} called {new_field['name']}")
+    return new_field['id']
+
+
+def link_row_name(association: dict) -> str:
+    """Returns the name of the link row field generated for the association"""
+    return association['name'] or association['class_name']
+
+
+def create_link_row(client: BaserowClient,
+                    association: dict,
+                    baserow_table_id: int,
+                    link_row_table_id: int,
+                    exists_ok=False) -> int | None:
+    """Generate a link row field. Returns its id or `None` if it already exists and
+    `exists_ok` is set."""
+    field = {
+        "name": link_row_name(association),
+        "type": "link_row",
+        "link_row_table_id": link_row_table_id
+    }
+
+    # Manually setting 'has_related_field' because tables associated
+    # with itself must not have this attribute
+    if association.get('has_related_field') is not None:
+        field["has_related_field"] = association['has_related_field']
+
+    # Create new field
+    field_response = client.create_database_table_field(baserow_table_id, field)
+    new_field = field_response.json()
 
+    # Checking for errors
+    if exists_ok and new_field.get('error') == FIELD_EXISTS_ERROR:
+        print(f"Link row field {field['name']} already exists")
+        return None
+    if field_response.status_code != 200:
+        raise BadFieldException(new_field)
 
-def create_link_rows(model_id: int, classes: dict, associations: dict):
-    """Generate link rows of model"""
-    for id_, class_ in classes.items():
-        class_name = xr.get_class_name(class_)
-        baserow_table_id = find_table_id_for_class(model_id, id_)
-        print("Current table:", class_name)
-        for association in associations[id_]:
-            # Setting new field
-            link_row_table_id = find_table_id_for_class(model_id, association['class_id'])
-            field = {
-                "name": association['name'] or association['class_name'],
-                "type": "link_row",
-                "link_row_table_id": link_row_table_id
-            }
-
-            # Manually setting 'has_related_field' because tables associated
-            # with itself must not have this attribute
-            if association.get('has_related_field') is not None:
-                field["has_related_field"] = association['has_related_field']
-
-            # Create new field
-            field_response = client.create_database_table_field(baserow_table_id, field)
-            new_field = field_response.json()
-
-            # Checking for errors
-            if field_response.status_code != 200:
-                raise BadFieldException(new_field)
-
-            print(f"Created new link row field {new_field['id']} called {new_field['name']}")
-            # new_field = update_field(field, baserow_table_id)
-            print(field)
+    print(f"Created new link row field {new_field['id']} called {new_field['name']}")
+    # new_field = update_field(field, baserow_table_id)
+    print(field)
+    return new_field['id']
+
+
+def create_link_rows(client: BaserowClient,
+                     scheduler: Scheduler,
+                     model_id: int,
+                     classes: dict,
+                     associations: dict,
+                     journal: dict):
+    """Schedule link rows of model, each after both of its tables.
+    Table ids are passed on from the tasks creating the tables, so no ID pairs are read.
+    Link rows recorded in the journal are skipped."""
+    for id_ in classes.keys():
+        for index, association in enumerate(associations[id_]):
+            key = f"{id_}:{association['class_id']}:{association['name']}:{index}"
+            if ("link", key) in journal:
+                continue
+
+            def save_link(field_id: int | None, key: str = key):
+                record_step(model_id, "link", key, field_id, commit=False)
+
+            # Link rows of a table from an earlier attempt may exist without being recorded
+            scheduler.add(
+                ("link", id_, index),
+                partial(create_link_row, exists_ok=("table", id_) in journal),
+                client, association,
+                after=[("table", id_), ("table", association['class_id'])],
+                on_done=save_link)
 
 
 # def generate_link_rows(classes: dict, associations: dict, id_pairs: list):
@@ -224,33 +344,20 @@ def create_link_rows(model_id: int, classes: dict, associations: dict):
 #             print(field)
 
 
-# def delete_table(table_id: int):
-#     """Delete a table from Baserow database"""
-#     delete_response = client.delete_database_table(table_id)
-
-#     if delete_response.status_code != 204:
-#         raise DeletingDatabasesException(delete_response.json())
-
-
-# def delete_tables(model_id, classes, database_id) -> list:
-#     """Remove unused tables from the database"""
-#     list_database_tables = client.list_database_tables(database_id).json()
-#     # print(f"{list_database_tables = }")
+def create_baserow_database(model: UMLModel,
+                            progress: Callable[[str, int, int], None] | None = None) -> int:
+    """Generate a new database
 
-#     for table in list_database_tables:
-#         uml_id = find_class_id_for_table(model_id, table['id'])
-#         if uml_id not in classes.keys():
-#             delete_table(table['id'])
+    Args:
+        model: model to generate the database for
+        progress: called with the current phase and the number of completed and
+            all Baserow calls in that phase
+    """
+    progress = progress or (lambda phase, completed, total: None)
 
-#             print(f"Table {table['id']} named {table['name']} deleted.")
-#             print("Looking for...")
-#             print({'class_id': uml_id, 'table_id': table['id']})
-#             delete_id_pair(IDPair(class_id=uml_id, table_id=table['id'], uml_model_id=model_id))
-
-
-def create_baserow_database(model: UMLModel) -> int:
-    """Generate a new database"""
     # Generate a new database in Baserow
+    progress("authorizing", 0, 0)
+    client = new_client(model)
     client.new_session_token(model.baserow_token)
 
     # print(client)
@@ -259,76 +366,84 @@ def create_baserow_database(model: UMLModel) -> int:
 
     # print("Congratulations! You got yourself a token!")
 
-    validate_group(model.group_id)
+    validate_group(client, model.group_id)
     # print(f"Group ID: {group_id}")
 
-    database_id = create_database(model.group_id, model.database_name)
-
-    packaged_elements = xr.get_packaged_elements(model.user_id, model.filename)
-    classes = xr.get_classes(packaged_elements)
-    data_types = xr.get_data_types(packaged_elements)
-    enumerations = xr.get_enumerations(packaged_elements)
-    associations = xr.get_associations(classes)
-    attributes = xr.get_attributes(classes, data_types, enumerations)
-
-    create_tables(model.id, classes, database_id, attributes)
-
-    create_link_rows(model.id, classes, associations)
+    # Steps finished by an earlier, failed attempt are not repeated
+    journal = load_journal(model.id)
+
+    progress("reading model", 0, 0)
+    uml_model = xr.get_model(model.user_id, model.filename)
+    classes = xr.get_classes(uml_model)
+    associations = xr.get_associations(uml_model)
+    attributes = xr.get_attributes(uml_model)
+
+    templates = current_app.config['DATABASE_TEMPLATES']
+    timeout = current_app.config['DATABASE_TEMPLATE_TIMEOUT']
+    key = template = None
+    if templates:
+        key = template_key(model)
+        template = find_template(model, key)
+    if template is not None and not journal:
+        progress("cloning template", 0, 1)
+        cloned = clone_template(client, template, model.database_name, classes, timeout)
+        if cloned is not None:
+            database_id, table_ids = cloned
+            create_id_pairs(model.id, table_ids, commit=False)
+            return database_id
+        template = None
+
+    progress("creating database", 0, 1)
+    if ("database", "") in journal:
+        database_id = journal[("database", "")]
+        validate_database(client, database_id)
+    else:
+        database_id = create_database(client, model.group_id, model.database_name)
+        # Keep the database even if generation fails, so it can be resumed
+        model.database_id = database_id
+        record_step(model.id, "database", "", database_id)
+        journal[("database", "")] = database_id
+
+    scheduler = Scheduler(current_app.config['GENERATION_WORKERS'])
+    create_tables(client, scheduler, model.id, classes, database_id, attributes, journal)
+    create_link_rows(client, scheduler, model.id, classes, associations, journal)
+    try:
+        results = scheduler.run(
+            lambda completed, total: progress("creating tables", completed, total))
+    finally:
+        # Keep steps finished before an error for resuming
+        db.session.commit()
+
+    # ID pairs of all tables become visible together once the database is complete
+    create_id_pairs(model.id, {
+        key[1]: table_id for key, table_id in results.items() if key[0] == "table"
+    }, commit=False)
+    clear_journal(model.id)
+
+    if templates and template is None:
+        # The database is complete even without a template, so nothing that
+        # goes wrong while saving one may fail the generation
+        model.database_id = database_id
+        db.session.commit()
+        progress("saving template", 0, 1)
+        try:
+            save_template(client, model, key, database_id, timeout)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            db.session.rollback()
+            print(f"Unable to save template of database {database_id}: {error}")
 
     return database_id
 
 
-# def update_baserow_database(
-#     user_id: int,
-#     group_id: int,
-#     baserow_token: str,
-#     database_id: int,
-#     filename: str,
-#     id_pairs: list
-# ):
-#     """Update the baserow database"""
-#     # Generate a new database in Baserow
-#     client.new_session_token(baserow_token)
-
-#     # print(client)
-#     if not client.is_token_valid():
-#         raise NotAuthorizedException("Not authorized to update database")
-
-#     # print("Congratulations! You got yourself a token!")
-
-#     validate_group(group_id)
-#     # print(f"Group ID: {group_id}")
-
-#     validate_database(database_id)
-
-#     # Get information from XMI file
-#     packaged_elements = xr.get_packaged_elements(user_id, filename)
-#     classes = xr.get_classes(packaged_elements)
-#     data_types = xr.get_data_types(packaged_elements)
-#     enumerations = xr.get_enumerations(packaged_elements)
-#     associations = xr.get_associations(classes)
-#     attributes = xr.get_attributes(classes, data_types, enumerations)
-
-#     # Create tables
-#     id_pairs = generate_tables(classes, database_id, attributes, id_pairs)
-
-#     # Add Link Rows in tables
-#     generate_link_rows(classes, associations, id_pairs)
-
-#     # Remove
-#     id_pairs = remove_tables(classes, database_id, id_pairs)
-
-#     return id_pairs
-
-
 def delete_baserow_database(model: UMLModel):
     """Delete a baserow database"""
+    client = new_client(model)
     client.new_session_token(model.baserow_token)
     if not client.is_token_valid():
         raise NotAuthorizedException("Not authorized to update database")
 
-    validate_group(model.group_id)
-    validate_database(model.database_id)
+    validate_group(client, model.group_id)
+    validate_database(client, model.database_id)
 
     delete_db_response = client.delete_application(model.database_id)
     if delete_db_response.status_code != 204:
@@ -0,0 +1,314 @@
+"""Update a generated Baserow database to match a changed UML model"""
+from collections.abc import Callable
+from flask import current_app
+from app.models import UMLModel
+import app.xmi_reader as xr
+from app.baserow_client import BaserowClient
+from app.scheduler import Scheduler
+from app.exc import (
+    NotAuthorizedException,
+    InvalidDatabaseException,
+    BadFieldException,
+    DeletingDatabasesException
+)
+from app import db
+from app.id_pairs_utils import load_pairs, create_id_pairs, delete_id_pairs
+from app.baserow_init import (
+    new_client,
+    validate_group,
+    validate_database,
+    create_table,
+    create_field,
+    create_link_row,
+    link_row_name,
+    split_header_fields
+)
+
+
+def list_tables(client: BaserowClient, database_id: int) -> list[dict]:
+    """Get all tables of the database"""
+    tables_response = client.list_database_tables(database_id)
+    if tables_response.status_code != 200:
+        raise InvalidDatabaseException(tables_response.json())
+    return tables_response.json()
+
+
+def list_fields(client: BaserowClient, table_id: int) -> list[dict]:
+    """Get all fields of the table"""
+    fields_response = client.list_database_table_fields(table_id)
+    if fields_response.status_code != 200:
+        raise InvalidDatabaseException(fields_response.json())
+    return fields_response.json()
+
+
+def field_changed(field: dict, live_field: dict) -> bool:
+    """Check if any property of the generated field differs from the field in Baserow.
+    Select options are compared by their values only. Properties Baserow doesn't
+    return, such as the `timezone` of created on fields, can't differ."""
+    for key, value in field.items():
+        if key == 'select_options':
+            live_values = [option['value'] for option in live_field.get(key) or []]
+            if [option['value'] for option in value] != live_values:
+                return True
+        elif key in live_field and live_field[key] != value:
+            return True
+    return False
+
+
+def field_update(field: dict, live_field: dict) -> dict:
+    """Returns the generated field with select options that already exist in Baserow
+    keeping their ids and colors, so selected values in rows are kept"""
+    field = dict(field)
+    if 'select_options' in field:
+        live_options = {
+            option['value']: option for option in live_field.get('select_options') or []}
+        field['select_options'] = [
+            live_options.get(option['value'], option) for option in field['select_options']]
+    return field
+
+
+def plan_changes(classes: dict,
+                 attributes: dict,
+                 associations: dict,
+                 pairs: dict[str, int],
+                 live_tables: list[dict],
+                 live_fields: dict[int, list[dict]]) -> list[dict]:
+    """Compare the model with its tables and fields in Baserow.
+
+    Args:
+        classes: classes of the model by their id
+        attributes: generated fields of every class
+        associations: associations of every class
+        pairs: table id of every class that already has a table
+        live_tables: tables of the database in Baserow
+        live_fields: fields of every table of an existing class
+
+    Returns:
+        Changes needed for the database to match the model, each a dict with an
+        `action` and the class it belongs to
+    """
+    live_names = {table['id']: table['name'] for table in live_tables}
+    # Classes whose table was deleted in Baserow get a new one
+    table_ids = {
+        class_id: table_id for class_id, table_id in pairs.items()
+        if class_id in classes and table_id in live_names}
+    changes = []
+
+    for class_id, table_id in pairs.items():
+        if class_id not in classes and table_id in live_names:
+            changes.append({"action": "delete_table", "class_id": class_id,
+                            "table_id": table_id, "name": live_names[table_id]})
+        elif class_id not in classes:
+            changes.append({"action": "forget_table", "class_id": class_id,
+                            "table_id": table_id})
+    deleted_tables = {
+        change['table_id'] for change in changes if change['action'] == "delete_table"}
+
+    # Plain text fields of new tables are created together with the table
+    new_fields = {}
+    for class_id, class_ in classes.items():
+        name = xr.get_class_name(class_)
+        if class_id not in table_ids:
+            header, new_fields[class_id] = split_header_fields(attributes[class_id])
+            changes.append({"action": "create_table", "class_id": class_id, "name": name,
+                            "field_names": header})
+        elif live_names[table_ids[class_id]] != name:
+            changes.append({"action": "rename_table", "class_id": class_id,
+                            "table_id": table_ids[class_id], "name": name})
+
+    # Links are matched first, so fields Baserow created on the other end of a
+    # kept link are never mistaken for attributes
+    missing_links = {}
+    kept_links = set()
+    for class_id in classes:
+        missing_links[class_id] = {
+            (link_row_name(association), table_ids.get(association['class_id'])): association
+            for association in associations[class_id]}
+        for live_field in live_fields.get(table_ids.get(class_id), []):
+            key = (live_field['name'], live_field.get('link_row_table_id'))
+            if live_field['type'] == "link_row" and key in missing_links[class_id]:
+                del missing_links[class_id][key]
+                kept_links.add(live_field['id'])
+                kept_links.add(live_field.get('link_row_related_field_id'))
+
+    deleted_links = set()
+    for class_id in classes:
+        missing_fields = {
+            field['name']: field for field in new_fields.get(class_id, attributes[class_id])}
+        for live_field in live_fields.get(table_ids.get(class_id), []):
+            if live_field.get('primary') or live_field['id'] in kept_links:
+                continue
+            field = missing_fields.pop(live_field['name'], None)
+            if field is not None:
+                if field_changed(field, live_field):
+                    changes.append({"action": "update_field", "class_id": class_id,
+                                    "field_id": live_field['id'],
+                                    "field": field_update(field, live_field)})
+            elif live_field['type'] != "link_row":
+                changes.append({"action": "delete_field", "class_id": class_id,
+                                "field_id": live_field['id'], "name": live_field['name']})
+            # Baserow removes links to deleted tables and the other end of deleted links
+            elif live_field.get('link_row_table_id') not in deleted_tables \
+                    and live_field.get('link_row_related_field_id') not in deleted_links:
+                deleted_links.add(live_field['id'])
+                changes.append({"action": "delete_field", "class_id": class_id,
+                                "field_id": live_field['id'], "name": live_field['name']})
+
+        for field in missing_fields.values():
+            changes.append({"action": "create_field", "class_id": class_id, "field": field})
+        for association in missing_links[class_id].values():
+            changes.append({"action": "create_link", "class_id": class_id,
+                            "association": association})
+
+    return changes
+
+
+def rename_table(client: BaserowClient, table_id: int, name: str):
+    """Change the name of a table"""
+    table_response = client.update_database_table(table_id, name)
+    if table_response.status_code != 200:
+        raise BadFieldException(table_response.json())
+    print(f"Renamed table {table_id} to {name}")
+
+
+def delete_table(client: BaserowClient, table_id: int):
+    """Delete a table from Baserow database"""
+    delete_response = client.delete_database_table(table_id)
+    if delete_response.status_code != 204:
+        raise DeletingDatabasesException(delete_response.json())
+    print(f"Deleted table {table_id}")
+
+
+def update_field(client: BaserowClient, field_id: int, field: dict):
+    """Change type and properties of a field"""
+    field_response = client.update_database_table_field(field_id, field)
+    if field_response.status_code != 200:
+        raise BadFieldException(field_response.json())
+    print(f"Updated field {field_id} called {field['name']}")
+
+
+def delete_field(client: BaserowClient, field_id: int):
+    """Delete a field from its table"""
+    delete_response = client.delete_database_table_field(field_id)
+    if delete_response.status_code not in (200, 204):
+        raise BadFieldException(delete_response.json())
+    print(f"Deleted field {field_id}")
+
+
+def apply_changes(client: BaserowClient,
+                  scheduler: Scheduler,
+                  database_id: int,
+                  pairs: dict[str, int],
+                  changes: list[dict],
+                  new_pairs: dict[str, int],
+                  old_pairs: set[str]):
+    """Schedule Baserow calls of the changes.
+
+    New fields and links of a table wait for the deleted fields of that table, so
+    they can reuse their names. Classes of created tables are added to `new_pairs`
+    and classes whose ID pair is no longer valid to `old_pairs` as the calls finish.
+    """
+    created = {change['class_id'] for change in changes if change['action'] == "create_table"}
+    for class_id, table_id in pairs.items():
+        if class_id not in created:
+            scheduler.complete(("table", class_id), table_id)
+
+    deletes: dict[str, list] = {}
+    for index, change in enumerate(changes):
+        if change['action'] == "delete_field":
+            deletes.setdefault(change['class_id'], []).append(("change", index))
+
+    for index, change in enumerate(changes):
+        action, class_id = change['action'], change['class_id']
+        waits_for = deletes.get(class_id, [])
+
+        if action == "create_table":
+            def save_id_pair(table_id: int, class_id: str = class_id):
+                # The pair of a table deleted in Baserow is replaced
+                if class_id in pairs:
+                    old_pairs.add(class_id)
+                new_pairs[class_id] = table_id
+
+            scheduler.add(("table", class_id), create_table, client, database_id,
+                          change['name'], change['field_names'], on_done=save_id_pair)
+        elif action in ("delete_table", "forget_table"):
+            def forget_id_pair(_result, class_id: str = class_id):
+                old_pairs.add(class_id)
+
+            if action == "delete_table":
+                scheduler.add(("change", index), delete_table, client, change['table_id'],
+                              on_done=forget_id_pair)
+            else:
+                scheduler.add(("change", index), lambda: None, on_done=forget_id_pair)
+        elif action == "rename_table":
+            scheduler.add(("change", index), rename_table, client, change['table_id'],
+                          change['name'])
+        elif action == "update_field":
+            scheduler.add(("change", index), update_field, client, change['field_id'],
+                          change['field'])
+        elif action == "delete_field":
+            scheduler.add(("change", index), delete_field, client, change['field_id'])
+        elif action == "create_field":
+            scheduler.add(("change", index), create_field, client, change['field'],
+                          after=[("table", class_id)], waits_for=waits_for)
+        elif action == "create_link":
+            association = change['association']
+            scheduler.add(("change", index), create_link_row, client, association,
+                          after=[("table", class_id), ("table", association['class_id'])],
+                          waits_for=waits_for)
+
+
+def update_baserow_database(model: UMLModel,
+                            progress: Callable[[str, int, int], None] | None = None) -> int:
+    """Apply changes of the model's XMI file to its existing database
+
+    Args:
+        model: model whose database is updated
+        progress: called with the current phase and the number of completed and
+            all Baserow calls in that phase
+    """
+    progress = progress or (lambda phase, completed, total: None)
+
+    progress("authorizing", 0, 0)
+    client = new_client(model)
+    client.new_session_token(model.baserow_token)
+    if not client.is_token_valid():
+        raise NotAuthorizedException("Not authorized to update database")
+
+    validate_group(client, model.group_id)
+    validate_database(client, model.database_id)
+
+    progress("reading model", 0, 0)
+    uml_model = xr.get_model(model.user_id, model.filename)
+    classes = xr.get_classes(uml_model)
+    associations = xr.get_associations(uml_model)
+    attributes = xr.get_attributes(uml_model)
+    # Link rows get their table ids from this map and the created tables, without
+    # looking up ID pairs one by one
+    pairs, _ = load_pairs(model.id)
+
+    # Fields are only listed for tables of classes still in the model
+    live_tables = list_tables(client, model.database_id)
+    live_ids = {table['id'] for table in live_tables}
+    scheduler = Scheduler(current_app.config['GENERATION_WORKERS'])
+    for class_id, table_id in pairs.items():
+        if class_id in classes and table_id in live_ids:
+            scheduler.add(table_id, list_fields, client, table_id)
+    live_fields = scheduler.run(lambda completed, total: progress("comparing", completed, total))
+
+    changes = plan_changes(classes, attributes, associations, pairs, live_tables, live_fields)
+    print(f"Applying {len(changes)} changes")
+
+    scheduler = Scheduler(current_app.config['GENERATION_WORKERS'])
+    new_pairs, old_pairs = {}, set()
+    apply_changes(client, scheduler, model.database_id, pairs, changes, new_pairs, old_pairs)
+    try:
+        scheduler.run(lambda completed, total: progress("applying changes", completed, total))
+    finally:
+        # ID pairs of finished calls are saved in one transaction, even after an error,
+        # so the next sync knows about tables that were already created or deleted
+        delete_id_pairs(model.id, old_pairs, commit=False)
+        create_id_pairs(model.id, new_pairs, commit=False)
+        db.session.commit()
+
+    return model.database_id
@@ -0,0 +1,161 @@
+"""
+Module for cloning generated databases of identical XMI files.
+
+The first database generated from an XMI file in a group is duplicated right
+away into a template no one writes to. Later models of the same file in that
+group clone the template with a single Baserow job instead of creating every
+table, field and link row.
+
+"""
+import time
+from collections import Counter
+from sqlalchemy.exc import IntegrityError
+from app import db
+import app.xmi_reader as xr
+from app.models import DatabaseTemplate, UMLModel
+from app.baserow_client import BaserowClient
+from app.exc import InvalidDatabaseException, MissingDatabaseException
+
+# Bump whenever generation creates different databases from the same XMI file
+TEMPLATE_VERSION = 1
+
+POLL_INTERVAL = 0.5
+
+
+def template_key(model: UMLModel) -> str:
+    """Returns the key of templates for the model's XMI file and the active type
+    mappings, as fields of the same file differ when the mappings change"""
+    digest = xr.get_digest(model.user_id, model.filename)
+    mappings = xr.get_type_mappings_digest()
+    return f"{digest}-{mappings[:8]}-v{TEMPLATE_VERSION}"
+
+
+def find_template(model: UMLModel, key: str) -> DatabaseTemplate | None:
+    """Get the template of the XMI file in the model's Baserow group"""
+    return DatabaseTemplate.query.filter_by(
+        digest=key, database_url=model.database_url, group_id=model.group_id).first()
+
+
+def duplicate_database(client: BaserowClient, database_id: int, timeout: float) -> dict:
+    """Duplicate a database and wait for Baserow to finish.
+
+    Returns:
+        The duplicated database with its tables
+
+    Raises:
+        MissingDatabaseException: If the database doesn't exist
+        InvalidDatabaseException: If the database can't be duplicated in time
+    """
+    job_response = client.duplicate_application(database_id)
+    if job_response.status_code == 404:
+        raise MissingDatabaseException(job_response.json())
+    if job_response.status_code not in (200, 202):
+        raise InvalidDatabaseException(job_response.json())
+    job = job_response.json()
+
+    deadline = time.monotonic() + timeout
+    while job['state'] not in ("finished", "failed"):
+        if time.monotonic() >= deadline:
+            raise InvalidDatabaseException(f"Duplicating database {database_id} timed out")
+        time.sleep(POLL_INTERVAL)
+        job_response = client.get_job(job['id'])
+        if job_response.status_code != 200:
+            raise InvalidDatabaseException(job_response.json())
+        job = job_response.json()
+
+    if job['state'] == "failed":
+        raise InvalidDatabaseException(job.get('human_readable_error') or job)
+    return job['duplicated_application']
+
+
+def table_ids_by_class(client: BaserowClient, database: dict, classes: dict
+) -> dict[str, int] | None:
+    """Match tables of a cloned database to classes by their names.
+
+    Returns:
+        Table id of every class or `None` if tables can't be matched unambiguously
+    """
+    tables = database.get('tables')
+    if tables is None:
+        tables_response = client.list_database_tables(database['id'])
+        if tables_response.status_code != 200:
+            return None
+        tables = tables_response.json()
+
+    names = Counter(table['name'] for table in tables)
+    by_name = {table['name']: table['id'] for table in tables}
+    table_ids = {}
+    for class_id, class_ in classes.items():
+        name = xr.get_class_name(class_)
+        if names[name] != 1:
+            return None
+        table_ids[class_id] = by_name[name]
+    return table_ids
+
+
+def clone_template(client: BaserowClient,
+                   template: DatabaseTemplate,
+                   database_name: str,
+                   classes: dict,
+                   timeout: float) -> tuple[int, dict[str, int]] | None:
+    """Clone the template into a new database with the given name.
+
+    Returns:
+        Id of the new database and table id of every class, or `None` if the
+        template can't be used and the database has to be generated
+    """
+    try:
+        database = duplicate_database(client, template.database_id, timeout)
+    except MissingDatabaseException as error:
+        # The template was deleted in Baserow
+        print(f"Template {template.id} no longer exists: {error}")
+        db.session.delete(template)
+        db.session.commit()
+        return None
+    except InvalidDatabaseException as error:
+        # The template is kept for later models, this one is generated
+        print(f"Unable to clone template {template.id}: {error}")
+        return None
+
+    table_ids = table_ids_by_class(client, database, classes)
+    if table_ids is None:
+        print(f"Tables of template {template.id} don't match the model")
+        client.delete_application(database['id'])
+        return None
+
+    rename_response = client.update_application(database['id'], database_name)
+    if rename_response.status_code != 200:
+        print(f"Unable to rename clone of template {template.id}: {rename_response.json()}")
+        client.delete_application(database['id'])
+        return None
+    print(f"Cloned template {template.id} into database {database['id']}")
+    return database['id'], table_ids
+
+
+def save_template(client: BaserowClient, model: UMLModel, key: str, database_id: int,
+                  timeout: float):
+    """Duplicate a newly generated database into the template of its XMI file
+
+    Raises:
+        InvalidDatabaseException: If the database can't be duplicated or renamed
+    """
+    database = duplicate_database(client, database_id, timeout)
+    rename_response = client.update_application(database['id'], f"UML template {key[:12]}")
+    if rename_response.status_code != 200:
+        # A template under the name of the generated database would confuse users
+        client.delete_application(database['id'])
+        raise InvalidDatabaseException(rename_response.json())
+
+    db.session.add(DatabaseTemplate(
+        digest=key,
+        database_url=model.database_url,
+        group_id=model.group_id,
+        database_id=database['id']))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another generation of the same XMI file saved its template first
+        db.session.rollback()
+        client.delete_application(database['id'])
+        return
+    print(f"Saved database {database_id} as template {database['id']}")
@@ -30,6 +30,13 @@ class InvalidDatabaseException(Exception):
     """
 
 
+class MissingDatabaseException(InvalidDatabaseException):
+    """
+    Exception raised when Baserow reports the database doesn't exist.
+    
+    """
+
+
 class BadFieldException(Exception):
     """
     Exception raised when something goes wrong while creating a new field.
@@ -44,6 +51,13 @@ class DeletingDatabasesException(Exception):
     """
 
 
+class ActiveJobException(Exception):
+    """
+    Exception raised when a model already has a queued or running job.
+    
+    """
+
+
 class BadRequestException(Exception):
     """
     Exception raised when Baserow request throws an error.
@@ -1,4 +1,6 @@
 """Utility functions for ID pairs"""
+from collections.abc import Iterable
+from sqlalchemy import insert, select
 from flask_jwt_extended import get_jwt_identity
 from app.models import UMLModel, IDPair
 from app import db
@@ -37,6 +39,18 @@ def find_table_id_for_class(model_id: int, class_id: str) -> int:
     return found_id_pair.table_id
 
 
+def load_pairs(model_id: int) -> tuple[dict[str, int], dict[int, str]]:
+    """Get all ID pairs of the model with one query.
+
+    Returns:
+        Table id of every class and class id of every table
+    """
+    rows = db.session.execute(
+        select(IDPair.class_id, IDPair.table_id).filter_by(uml_model_id=model_id)).all()
+    return ({class_id: table_id for class_id, table_id in rows},
+            {table_id: class_id for class_id, table_id in rows})
+
+
 def create_id_pair(class_id: str, table_id: int, uml_model_id: int) -> IDPair:
     """Create ID pair in model"""
     new_pair = IDPair(class_id=class_id, table_id=table_id, uml_model_id=uml_model_id)
@@ -50,3 +64,24 @@ def delete_id_pair(pair: IDPair):
     db.session.delete(pair)
     db.session.commit()
     db.session.rollback()
+
+
+def create_id_pairs(model_id: int, table_ids: dict[str, int], commit=True):
+    """Create ID pairs of all given classes and their tables with a single bulk insert"""
+    if table_ids:
+        db.session.execute(insert(IDPair), [
+            {'class_id': class_id, 'table_id': table_id, 'uml_model_id': model_id}
+            for class_id, table_id in table_ids.items()])
+    if commit:
+        db.session.commit()
+
+
+def delete_id_pairs(model_id: int, class_ids: Iterable[str] | None = None, commit=True):
+    """Delete ID pairs of the given classes, or all ID pairs of the model, with a
+    single statement"""
+    query = IDPair.query.filter_by(uml_model_id=model_id)
+    if class_ids is not None:
+        query = query.filter(IDPair.class_id.in_(list(class_ids)))
+    query.delete(synchronize_session=False)
+    if commit:
+        db.session.commit()
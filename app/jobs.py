@@ -0,0 +1,222 @@
+"""
+Module for generating Baserow databases in the background.
+
+"""
+import time
+from datetime import datetime, timedelta
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread
+from flask import Flask
+from sqlalchemy import func, inspect, or_, update
+from sqlalchemy.exc import IntegrityError
+from app import db, table_directory
+from app.models import GenerationJob, ImportJob, UMLModel
+from app.baserow_init import create_baserow_database
+from app.baserow_sync import update_baserow_database
+from app.exc import (
+    ActiveJobException,
+    NotAuthorizedException,
+    InvalidGroupException,
+    InvalidDatabaseException,
+    BadFieldException,
+    DeletingDatabasesException
+)
+
+ERROR_MESSAGES = {
+    NotAuthorizedException: "Unauthorized to connect to Baserow",
+    InvalidGroupException: "Baserow group invalid",
+    InvalidDatabaseException: "Baserow database invalid",
+    BadFieldException: "Error while creating a field",
+    DeletingDatabasesException: "Error while deleting a table",
+    IntegrityError: "Integrity error",
+}
+
+# Called with the model and a progress callback for each kind of job, returns the database id
+JOB_KINDS: dict[str, Callable[..., int]] = {
+    'generation': create_baserow_database,
+    'sync': update_baserow_database,
+}
+
+SUCCESS_MESSAGES = {
+    'generation': "created",
+    'sync': "synced",
+}
+
+# Commit progress at most this often to keep database writes low
+PROGRESS_INTERVAL = 1.0
+
+# Seconds between updates of the jobs a process has queued or is running
+HEARTBEAT_INTERVAL = 30.0
+# Queued or running jobs not updated for this long belong to a stopped process
+ABANDONED_AFTER = 3 * HEARTBEAT_INTERVAL
+
+_executor = {
+    'pool': None,
+}
+_heartbeat = {
+    'app': None,
+    'thread': None,
+}
+_active_jobs: dict[type, set[int]] = {GenerationJob: set(), ImportJob: set()}
+_active_lock = Lock()
+
+
+def configure_jobs(workers: int = 2):
+    """Set the number of generation jobs running at the same time"""
+    if _executor['pool'] is not None:
+        _executor['pool'].shutdown(wait=False)
+    _executor['pool'] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="generation")
+
+
+def track_job(job_model: type, job_id: int, active: bool = True):
+    """Start or stop sending heartbeats of a job queued by this process"""
+    with _active_lock:
+        if active:
+            _active_jobs[job_model].add(job_id)
+        else:
+            _active_jobs[job_model].discard(job_id)
+
+
+def beat():
+    """Update the time of every job this process has queued or is running"""
+    with _active_lock:
+        active = {job_model: list(ids) for job_model, ids in _active_jobs.items() if ids}
+    for job_model, ids in active.items():
+        db.session.execute(
+            update(job_model)
+            .where(job_model.id.in_(ids))
+            .values(date_updated=datetime.utcnow()))
+    db.session.commit()
+
+
+def _send_heartbeats():
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL)
+        with _heartbeat['app'].app_context():
+            try:
+                beat()
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                print(f"Unable to update active jobs: {error}")
+            finally:
+                db.session.remove()
+
+
+def start_heartbeat(app: Flask):
+    """Start updating jobs of this process in the background, so other processes
+    can tell them from abandoned jobs"""
+    _heartbeat['app'] = app
+    if _heartbeat['thread'] is None:
+        _heartbeat['thread'] = Thread(target=_send_heartbeats, name="job-heartbeat", daemon=True)
+        _heartbeat['thread'].start()
+
+
+def fail_abandoned_jobs(model_id: int | None = None):
+    """Fail queued or running jobs whose process stopped sending heartbeats, so
+    they can be resumed instead of blocking the model
+
+    Args:
+        model_id: fail only jobs of this model, all models by default
+    """
+    tables = inspect(db.engine)
+    cutoff = datetime.utcnow() - timedelta(seconds=ABANDONED_AFTER)
+    for job_model in (GenerationJob, ImportJob):
+        if not tables.has_table(job_model.__tablename__):
+            continue
+        with _active_lock:
+            own = list(_active_jobs[job_model])
+        query = (
+            update(job_model)
+            .where(job_model.status.in_(('queued', 'running')))
+            .where(or_(job_model.date_updated.is_(None), job_model.date_updated < cutoff))
+            .where(job_model.id.not_in(own)))
+        if model_id is not None:
+            query = query.where(job_model.uml_model_id == model_id)
+        failed = db.session.execute(
+            query.values(status='failed', error="Job was abandoned")).rowcount
+        if failed:
+            print(f"Failed {failed} abandoned jobs in {job_model.__tablename__}")
+    db.session.commit()
+
+
+def submit_generation(app: Flask, model: UMLModel, kind: str = 'generation') -> GenerationJob:
+    """Queue generation or sync of the model's database and return its job
+
+    Args:
+        kind: `generation` creates a new database, `sync` changes the existing one
+
+    Raises:
+        ActiveJobException: If the model already has a queued or running job
+    """
+    job = GenerationJob(uml_model_id=model.id, kind=kind)
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError as error:
+        # Another request queued a job of the model since it was checked
+        db.session.rollback()
+        raise ActiveJobException(f"Model {model.id} already has an active job") from error
+
+    track_job(GenerationJob, job.id)
+    _executor['pool'].submit(run_generation, app, job.id)
+    return job
+
+
+def run_generation(app: Flask, job_id: int):
+    """Generate or sync the database of the job's model and record progress and
+    errors in the job"""
+    with app.app_context():
+        job = db.session.get(GenerationJob, job_id)
+        model = db.session.get(UMLModel, job.uml_model_id)
+        generate = JOB_KINDS[job.kind]
+        job.status = 'running'
+        db.session.commit()
+
+        last_commit = [time.monotonic()]
+
+        def progress(phase: str, completed: int, total: int):
+            new_phase = job.phase != phase
+            job.phase, job.completed, job.total = phase, completed, total
+            if new_phase or completed == total \
+                    or time.monotonic() - last_commit[0] >= PROGRESS_INTERVAL:
+                db.session.commit()
+                last_commit[0] = time.monotonic()
+
+        try:
+            model.database_id = generate(model, progress)
+            job.status = 'succeeded'
+            job.phase = 'done'
+            db.session.commit()
+            print(f"Database {SUCCESS_MESSAGES[job.kind]} successfully:", model.database_id)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            db.session.rollback()
+            fail(job_id, error_message(error))
+        finally:
+            # Tables were created, renamed or deleted even if the job failed
+            table_directory.invalidate(model.id)
+            track_job(GenerationJob, job_id, active=False)
+            db.session.remove()
+
+
+def tables_changed_at(model_id: int) -> datetime | None:
+    """Returns when the last finished job of the model could have changed its
+    tables, shared by all processes unlike their table directories"""
+    return db.session.query(func.max(GenerationJob.date_updated)) \
+        .filter(GenerationJob.uml_model_id == model_id,
+                GenerationJob.status.in_(('succeeded', 'failed'))).scalar()
+
+
+def error_message(error: Exception) -> str:
+    """Returns the message reported for an error raised while generating"""
+    for error_type, message in ERROR_MESSAGES.items():
+        if isinstance(error, error_type):
+            return message
+    return f"Unexpected error: {error}"
+
+
+def fail(job_id: int, message: str):
+    """Mark the job as failed with the given message"""
+    job = db.session.get(GenerationJob, job_id)
+    job.status = 'failed'
+    job.error = message
+    db.session.commit()
@@ -0,0 +1,23 @@
+"""Journal of finished generation steps, used to resume a failed generation"""
+from app import db
+from app.models import GenerationStep
+
+
+def load_journal(model_id: int) -> dict[tuple[str, str], int | None]:
+    """Get ids created by every finished step of the model by its kind and key"""
+    steps = GenerationStep.query.filter_by(uml_model_id=model_id).all()
+    return {(step.kind, step.key): step.result_id for step in steps}
+
+
+def record_step(model_id: int, kind: str, key: str, result_id: int | None, commit=True):
+    """Record a finished step of the model's generation"""
+    db.session.add(GenerationStep(uml_model_id=model_id, kind=kind, key=key, result_id=result_id))
+    if commit:
+        db.session.commit()
+
+
+def clear_journal(model_id: int, commit=True):
+    """Delete all recorded steps of the model"""
+    GenerationStep.query.filter_by(uml_model_id=model_id).delete()
+    if commit:
+        db.session.commit()
@@ -0,0 +1,110 @@
+"""
+Module for upgrading the schema of existing SQLite and PostgreSQL databases in place.
+
+Every migration runs once in its own transaction and is recorded in the
+`schema_version` table. Statements are idempotent, so databases created by
+`db.create_all()` with the current models are upgraded without changes.
+
+"""
+from collections.abc import Callable
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+
+def remove_duplicate_pairs(connection: Connection):
+    """Keep only the newest ID pair of every class and table in a model, so the
+    unique indexes can be created"""
+    for column in ('class_id', 'table_id'):
+        removed = connection.execute(text(f"""
+            DELETE FROM id_pair
+            WHERE {column} IS NOT NULL AND id NOT IN (
+                SELECT MAX(id) FROM id_pair
+                WHERE {column} IS NOT NULL
+                GROUP BY uml_model_id, {column})
+        """)).rowcount
+        if removed:
+            print(f"Removed {removed} duplicate ID pairs by {column}")
+
+
+def create_indexes(*statements: str) -> Callable[[Connection], None]:
+    """Returns a migration running the given `CREATE INDEX IF NOT EXISTS` statements"""
+    def migrate(connection: Connection):
+        for statement in statements:
+            connection.execute(text(statement))
+    return migrate
+
+
+def add_column(table: str, column: str, definition: str) -> Callable[[Connection], None]:
+    """Returns a migration adding the column unless the table already has it"""
+    def migrate(connection: Connection):
+        columns = {info['name'] for info in inspect(connection).get_columns(table)}
+        if column not in columns:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+    return migrate
+
+
+def index_active_jobs(connection: Connection):
+    """Fail all but the newest queued or running job of every model, so only one
+    can be active, and index active jobs by model"""
+    failed = connection.execute(text("""
+        UPDATE generation_job SET status = 'failed', error = 'Job was abandoned'
+        WHERE status IN ('queued', 'running') AND id NOT IN (
+            SELECT MAX(id) FROM generation_job
+            WHERE status IN ('queued', 'running')
+            GROUP BY uml_model_id)
+    """)).rowcount
+    if failed:
+        print(f"Failed {failed} abandoned generation jobs")
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_generation_job_active "
+        "ON generation_job (uml_model_id) WHERE status IN ('queued', 'running')"))
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Remove duplicate ID pairs", remove_duplicate_pairs),
+    (2, "Index ID pairs and models by their lookup columns", create_indexes(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_id_pair_model_class "
+        "ON id_pair (uml_model_id, class_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_id_pair_model_table "
+        "ON id_pair (uml_model_id, table_id)",
+        "CREATE INDEX IF NOT EXISTS ix_uml_model_user_id ON uml_model (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_generation_job_uml_model_id "
+        "ON generation_job (uml_model_id)",
+        "CREATE INDEX IF NOT EXISTS ix_generation_step_uml_model_id "
+        "ON generation_step (uml_model_id)",
+    )),
+    (3, "Record the kind of generation jobs", add_column(
+        'generation_job', 'kind', "VARCHAR(16) NOT NULL DEFAULT 'generation'")),
+    (4, "Allow one active generation job per model", index_active_jobs),
+]
+
+
+def schema_version() -> int:
+    """Returns the version of the last migration applied to the database"""
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version INTEGER PRIMARY KEY, description VARCHAR(256) NOT NULL)"))
+        version = connection.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    return version or 0
+
+
+def upgrade_database():
+    """Apply every migration newer than the version of the database"""
+    current = schema_version()
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            with db.engine.begin() as connection:
+                migrate(connection)
+                connection.execute(
+                    text("INSERT INTO schema_version (version, description) "
+                         "VALUES (:version, :description)"),
+                    {'version': version, 'description': description})
+        except IntegrityError:
+            # Another worker applied the same migration at the same time
+            continue
+        print(f"Applied migration {version}: {description}")
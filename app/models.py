@@ -46,7 +46,7 @@ class UMLModel(db.Model, SerializerMixin):
     filename = db.Column(db.String(256), nullable=False)
     group_id = db.Column(db.Integer, nullable=False)
     database_id = db.Column(db.Integer, nullable=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
 
     def __repr__(self) -> str:
         return f'<UMLModel {self.id}>'
@@ -55,6 +55,11 @@ class UMLModel(db.Model, SerializerMixin):
 class IDPair(db.Model, SerializerMixin):
     """IDs of matching tables and classes"""
     __tablename__ = 'id_pair'
+    __table_args__ = (
+        # A class has one table and a table one class in each model
+        db.Index('ix_id_pair_model_class', 'uml_model_id', 'class_id', unique=True),
+        db.Index('ix_id_pair_model_table', 'uml_model_id', 'table_id', unique=True),
+    )
     serialize_only = ('id', 'class_id', 'table_id')
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -66,6 +71,101 @@ class IDPair(db.Model, SerializerMixin):
         return f'<IDMatch {self.id}>'
 
 
+class GenerationJob(db.Model, SerializerMixin):
+    """Background generation or sync of a Baserow database for a UML model"""
+    __tablename__ = 'generation_job'
+    __table_args__ = (
+        # A model has at most one queued or running job
+        db.Index('ix_generation_job_active', 'uml_model_id', unique=True,
+                 sqlite_where=db.text("status IN ('queued', 'running')"),
+                 postgresql_where=db.text("status IN ('queued', 'running')")),
+    )
+    serialize_only = (
+        'id', 'uml_model_id', 'kind', 'status', 'phase', 'completed', 'total', 'error',
+        'date_added', 'date_updated'
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    uml_model_id = db.Column(db.Integer, db.ForeignKey('uml_model.id'), index=True)
+    # generation of a new database or sync of an existing one
+    kind = db.Column(db.String(16), nullable=False, default='generation',
+                     server_default='generation')
+    # queued, running, succeeded or failed
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    phase = db.Column(db.String(64), nullable=False, default='queued')
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(), nullable=True)
+    date_added = db.Column(db.DateTime, default=datetime.utcnow)
+    date_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f'<GenerationJob {self.id}>'
+
+
+class ImportJob(db.Model, SerializerMixin):
+    """Background import of a CSV or NDJSON file into a table of a model's database"""
+    __tablename__ = 'import_job'
+    serialize_only = (
+        'id', 'uml_model_id', 'table_name', 'file_format', 'status', 'rows', 'imported',
+        'failed', 'error', 'date_added', 'date_updated'
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    uml_model_id = db.Column(db.Integer, db.ForeignKey('uml_model.id'), index=True)
+    table_name = db.Column(db.String(256), nullable=False)
+    # csv or ndjson
+    file_format = db.Column(db.String(16), nullable=False)
+    # queued, running, succeeded or failed
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    # Rows read from the file, rows created in Baserow and rows in the error report
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    imported = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(), nullable=True)
+    date_added = db.Column(db.DateTime, default=datetime.utcnow)
+    date_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f'<ImportJob {self.id}>'
+
+
+class GenerationStep(db.Model, SerializerMixin):
+    """Journal entry of a finished Baserow call while generating a database"""
+    __tablename__ = 'generation_step'
+    serialize_only = ('id', 'uml_model_id', 'kind', 'key', 'result_id')
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    uml_model_id = db.Column(db.Integer, db.ForeignKey('uml_model.id'), index=True)
+    # database, table, field or link
+    kind = db.Column(db.String(16), nullable=False)
+    key = db.Column(db.String(512), nullable=False)
+    result_id = db.Column(db.Integer, nullable=True)
+
+    def __repr__(self) -> str:
+        return f'<GenerationStep {self.id}>'
+
+
+class DatabaseTemplate(db.Model, SerializerMixin):
+    """Untouched copy of a generated database, cloned for later models of the same XMI file"""
+    __tablename__ = 'database_template'
+    __table_args__ = (
+        db.Index('ix_database_template_key', 'digest', 'database_url', 'group_id', unique=True),
+    )
+    serialize_only = ('id', 'digest', 'database_url', 'group_id', 'database_id', 'date_added')
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # Content hash of the XMI file and version of the generation
+    digest = db.Column(db.String(80), nullable=False)
+    database_url = db.Column(db.String(), nullable=False)
+    group_id = db.Column(db.Integer, nullable=False)
+    database_id = db.Column(db.Integer, nullable=False)
+    date_added = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f'<DatabaseTemplate {self.id}>'
+
+
 # class Log(db.Model, SerializerMixin):
 #     """Log records of actions"""
 #     __tablename__ = 'log'
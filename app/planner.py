@@ -0,0 +1,147 @@
+"""
+Module for planning the generation of a database without calling Baserow.
+
+"""
+import heapq
+import re
+from collections import Counter
+from collections.abc import Hashable
+from threading import Lock
+from flask import current_app
+import app.xmi_reader as xr
+from app import rate_limit
+from app.baserow_client import URL, BaserowClient, get_host
+from app.scheduler import Scheduler
+from app.baserow_init import create_database, create_tables, create_link_rows
+
+ID_PATTERN = re.compile(r"/\d+/")
+
+
+class RecordedResponse:
+    """A successful response to a recorded request"""
+    def __init__(self, status_code: int, body: object):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        """Returns the body of the response"""
+        return self.body
+
+
+class RecordingClient(BaserowClient):
+    """
+    A client recording requests instead of sending them to Baserow.
+
+    Created objects get increasing ids, so the generation code runs unchanged.
+
+    """
+    def __init__(self, url: str = URL):
+        super().__init__(url)
+        self.__token_status__ = 200
+        self.operations: list[dict] = []
+        self.task: Hashable | None = None
+        self.next_id = 0
+        self.lock = Lock()
+
+    def send(self, method: str, url: str, **kwargs) -> RecordedResponse:
+        """Record the request and answer it as Baserow would on success"""
+        path = url.removeprefix(self.__url__)
+        body = kwargs.get('json')
+        with self.lock:
+            self.operations.append({
+                'method': method,
+                'endpoint': ID_PATTERN.sub("/{id}/", f"/{path}"),
+                'path': f"/{path}",
+                'body': body,
+                'task': self.task,
+            })
+            if method == "POST":
+                self.next_id += 1
+                return RecordedResponse(200, {**(body or {}), 'id': self.next_id})
+        if method == "DELETE":
+            return RecordedResponse(204, None)
+        return RecordedResponse(200, [] if method == "GET" else {})
+
+
+def _recorded(client: RecordingClient, key: Hashable, func):
+    def run(*args):
+        client.task = key
+        return func(*args)
+    return run
+
+
+def estimate_duration(operations: list[dict],
+                      tasks: dict[Hashable, tuple],
+                      latency: float,
+                      workers: int) -> float:
+    """Estimate seconds needed for the operations.
+
+    Tasks are replayed in the recorded order on the given number of workers, each
+    call taking `latency` seconds, and the result is limited by the rate limit.
+    """
+    calls = Counter(operation['task'] for operation in operations)
+    finished: dict[Hashable, float] = {}
+    free = [0.0] * workers
+    # Calls made outside of tasks run one by one before all tasks
+    start = calls.pop(None, 0) * latency
+    for task in dict.fromkeys(operation['task'] for operation in operations):
+        if task is None:
+            continue
+        ready = max((finished.get(dependency, start) for dependency in tasks[task]),
+                    default=start)
+        began = max(ready, heapq.heappop(free))
+        finished[task] = began + calls[task] * latency
+        heapq.heappush(free, finished[task])
+
+    settings = rate_limit.get_settings()
+    limited = (len(operations) - settings['burst']) / settings['rate']
+    return max(max(finished.values(), default=start), limited)
+
+
+def plan_generation(user_id: int, filename: str, url: str | None = None) -> dict:
+    """Record the Baserow calls generating a database for the XMI file would make.
+
+    Returns:
+        Ordered operations, number of calls per endpoint and an estimated duration
+        in seconds based on the measured latency of the Baserow host
+    """
+    uml_model = xr.get_model(user_id, filename)
+    classes = xr.get_classes(uml_model)
+    associations = xr.get_associations(uml_model)
+    attributes = xr.get_attributes(uml_model)
+
+    url = url or URL
+    client = RecordingClient(url)
+    client.list_groups()
+    database_id = create_database(client, 0, "plan")
+
+    # One worker keeps the recorded order the same as the order of dependencies
+    scheduler = Scheduler(1)
+    create_tables(client, scheduler, None, classes, database_id, attributes, {})
+    create_link_rows(client, scheduler, None, classes, associations, {})
+    for key, task in scheduler.tasks.items():
+        # Planning records nothing in the database
+        task.on_done = None
+        task.func = _recorded(client, key, task.func)
+    scheduler.run()
+
+    latency = rate_limit.get_stats().get(get_host(url), {}).get('latency') \
+        or current_app.config['BASEROW_ESTIMATED_LATENCY']
+    workers = current_app.config['GENERATION_WORKERS']
+    tasks = {key: (*task.after, *task.waits_for) for key, task in scheduler.tasks.items()}
+
+    return {
+        'operations': [
+            {key: value for key, value in operation.items() if key != 'task'}
+            for operation in client.operations],
+        'calls': len(client.operations),
+        'calls_per_endpoint': [
+            {'method': method, 'endpoint': endpoint, 'calls': calls}
+            for (method, endpoint), calls in Counter(
+                (operation['method'], operation['endpoint'])
+                for operation in client.operations).items()],
+        'latency': latency,
+        'workers': workers,
+        'estimated_duration': round(
+            estimate_duration(client.operations, tasks, latency, workers), 3),
+    }
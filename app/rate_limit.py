@@ -0,0 +1,186 @@
+"""
+Module for keeping requests to Baserow within its rate limits.
+
+"""
+import random
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from threading import Lock
+
+RETRY_STATUS_CODES = (429, 502, 503)
+# POST isn't idempotent and may have been handled before a gateway error, so
+# it's retried only when the host throttled it
+POST_RETRY_STATUS_CODES = (429,)
+
+# Weight of the newest response in the moving average of latency
+LATENCY_WEIGHT = 0.1
+
+_settings = {
+    'rate': 10.0,
+    'burst': 20,
+    'max_retries': 5,
+    'backoff': 0.5,
+    'max_backoff': 30.0,
+}
+_buckets: dict[str, 'TokenBucket'] = {}
+_buckets_lock = Lock()
+
+
+class TokenBucket:
+    """
+    A token bucket shared by all threads sending requests to the same host.
+
+    Every request reserves a token and sleeps until the reserved token is refilled,
+    so waiting requests are served in the order they arrived.
+
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = Lock()
+        self.stats = {
+            'waiting': 0,
+            'max_waiting': 0,
+            'in_flight': 0,
+            'requests': 0,
+            'retries': 0,
+            'throttled': 0,
+            'latency': None,
+        }
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Wait for a token and count the request as in flight"""
+        with self.lock:
+            self._refill()
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+            self.stats['waiting'] += 1
+            self.stats['max_waiting'] = max(self.stats['max_waiting'], self.stats['waiting'])
+
+        if delay:
+            time.sleep(delay)
+
+        with self.lock:
+            self.stats['waiting'] -= 1
+            self.stats['in_flight'] += 1
+            self.stats['requests'] += 1
+
+    def release(self):
+        """Count the request as finished"""
+        with self.lock:
+            self.stats['in_flight'] -= 1
+
+    def pause(self, seconds: float):
+        """Hold back every request to the host for the given number of seconds"""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def record_latency(self, seconds: float):
+        """Add the duration of a response to the moving average of latency"""
+        with self.lock:
+            latency = self.stats['latency']
+            self.stats['latency'] = seconds if latency is None \
+                else latency + LATENCY_WEIGHT * (seconds - latency)
+
+    def count_retry(self, throttled: bool):
+        """Count a retried request and whether the host throttled it"""
+        with self.lock:
+            self.stats['retries'] += 1
+            self.stats['throttled'] += throttled
+
+
+def configure_rate_limits(rate: float = 10.0,
+                          burst: int = 20,
+                          max_retries: int = 5,
+                          backoff: float = 0.5):
+    """Set requests per second, burst size and retries of every host"""
+    with _buckets_lock:
+        _settings.update(rate=rate, burst=burst, max_retries=max_retries, backoff=backoff)
+        _buckets.clear()
+
+
+def get_bucket(host: str) -> TokenBucket:
+    """Returns the token bucket of the given host"""
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = _buckets[host] = TokenBucket(_settings['rate'], _settings['burst'])
+        return bucket
+
+
+def get_settings() -> dict:
+    """Returns requests per second, burst size and retries used for every host"""
+    with _buckets_lock:
+        return dict(_settings)
+
+
+def get_stats() -> dict[str, dict]:
+    """Returns queue depth, request counts and average latency of every host"""
+    with _buckets_lock:
+        buckets = dict(_buckets)
+    stats = {}
+    for host, bucket in buckets.items():
+        with bucket.lock:
+            stats[host] = dict(bucket.stats)
+    return stats
+
+
+def retry_after(response) -> float | None:
+    """Returns seconds from the `Retry-After` header or `None` if it's not set"""
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_retried(method: str, status_code: int) -> bool:
+    """Returns `True` if a response with the status code is retried for the method"""
+    if method.upper() == "POST":
+        return status_code in POST_RETRY_STATUS_CODES
+    return status_code in RETRY_STATUS_CODES
+
+
+def send(session, host: str, method: str, url: str, **kwargs):
+    """Send a request through the host's token bucket, retrying throttled and
+    unavailable responses with jittered exponential backoff. POST requests are
+    retried only when throttled."""
+    bucket = get_bucket(host)
+    attempt = 0
+    while True:
+        bucket.acquire()
+        start = time.monotonic()
+        try:
+            response = session.request(method, url, **kwargs)
+        finally:
+            bucket.release()
+        bucket.record_latency(time.monotonic() - start)
+
+        if not is_retried(method, response.status_code) or attempt >= _settings['max_retries']:
+            return response
+        response.close()
+
+        delay = retry_after(response)
+        if delay is not None:
+            bucket.pause(delay)
+        else:
+            backoff = min(_settings['max_backoff'], _settings['backoff'] * 2 ** attempt)
+            time.sleep(random.uniform(0, backoff))
+        attempt += 1
+        bucket.count_retry(response.status_code == 429)
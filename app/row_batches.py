@@ -0,0 +1,122 @@
+"""
+Module for writing many rows with Baserow's batch endpoints.
+
+"""
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from app import rate_limit
+from app.baserow_client import get_host, get_session
+
+# Most rows Baserow accepts in one batch request
+BATCH_SIZE = 200
+
+_settings = {
+    'workers': 4,
+}
+
+
+def configure_row_batches(workers: int = 4):
+    """Set the number of batch requests sent at the same time for one endpoint call"""
+    _settings['workers'] = workers
+
+
+def batch_sender(database_url: str, token: str, method: str, url: str) -> Callable:
+    """Returns a function sending a list of items to a Baserow batch endpoint
+    within the rate limit of its host"""
+    session = get_session(database_url)
+    host = get_host(database_url)
+
+    def send(items: list):
+        return rate_limit.send(
+            session, host, method, url,
+            headers={'Authorization': f'JWT {token}'},
+            json={'items': items},
+            timeout=None)
+    return send
+
+
+def error_body(response) -> object:
+    """Returns the JSON error of a response or its text"""
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+def item_errors(error: object) -> dict[int, object]:
+    """Returns errors by position of the items Baserow rejected a batch for, or an
+    empty dictionary if the batch wasn't rejected because of single items"""
+    if not isinstance(error, dict) or error.get('error') != "ERROR_REQUEST_BODY_VALIDATION":
+        return {}
+    detail = error.get('detail')
+    items = detail.get('items') if isinstance(detail, dict) else None
+    if isinstance(items, list):
+        return {position: item for position, item in enumerate(items) if item}
+    if isinstance(items, dict):
+        return {int(position): item for position, item in items.items()
+                if str(position).isdigit()}
+    return {}
+
+
+def send_chunk(send: Callable, items: list, start: int) -> list[dict]:
+    """Send items in one batch and return a result for every item"""
+    return send_items(send, items, list(range(start, start + len(items))))
+
+
+def send_items(send: Callable, items: list, indexes: list[int]) -> list[dict]:
+    """Send items in one batch and return a result for every item by its index.
+
+    Baserow rejects the whole batch if any item is invalid and lists the invalid
+    items, so only the valid items are sent again. Any other error, such as a
+    missing table or row, is reported for every item of the batch.
+    """
+    response = send(items)
+    if response.status_code < 300:
+        rows = response.json().get('items', []) if response.status_code != 204 else []
+        return [{'index': index, 'status': response.status_code,
+                 'row': rows[offset] if offset < len(rows) else None}
+                for offset, index in enumerate(indexes)]
+
+    error = error_body(response)
+    invalid = {position: detail for position, detail in item_errors(error).items()
+               if position < len(items)} if response.status_code == 400 else {}
+    if not invalid:
+        return [{'index': index, 'status': response.status_code, 'error': error}
+                for index in indexes]
+
+    results = [{'index': indexes[position], 'status': response.status_code,
+                'error': {'error': error['error'], 'detail': detail}}
+               for position, detail in invalid.items()]
+    valid = [position for position in range(len(items)) if position not in invalid]
+    if valid:
+        results += send_items(send, [items[position] for position in valid],
+                              [indexes[position] for position in valid])
+    return sorted(results, key=lambda result: result['index'])
+
+
+def send_stream(send: Callable, batches: Iterable[list]) -> Iterator[list[dict]]:
+    """Send batches concurrently and yield the results of every batch in order.
+
+    Batches are read lazily and at most `workers` of them are in flight, so
+    memory doesn't grow with the number of items. Result indexes count items
+    over all batches.
+    """
+    workers = _settings['workers']
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        start = 0
+        for batch in batches:
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+            pending.append(executor.submit(send_chunk, send, batch, start))
+            start += len(batch)
+        while pending:
+            yield pending.popleft().result()
+
+
+def send_batches(send: Callable, items: list) -> list[dict]:
+    """Split items into batches, send them concurrently and return a result for
+    every item in the order of the items"""
+    batches = (items[start:start + BATCH_SIZE] for start in range(0, len(items), BATCH_SIZE))
+    return [result for results in send_stream(send, batches) for result in results]
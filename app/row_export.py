@@ -0,0 +1,174 @@
+"""
+Module for streaming every row of Baserow tables as NDJSON or CSV.
+
+"""
+import csv
+import io
+import json
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from app import rate_limit
+from app.baserow_client import get_host, get_session
+from app.exc import BadRequestException
+
+# Most rows Baserow returns in one page
+PAGE_SIZE = 200
+
+FORMATS = {
+    'ndjson': "application/x-ndjson",
+    'csv': "text/csv",
+}
+
+_settings = {
+    'prefetch': 4,
+}
+
+
+def configure_row_export(prefetch: int = 4):
+    """Set the number of pages fetched ahead while a page is written out"""
+    _settings['prefetch'] = max(1, prefetch)
+
+
+def table_reader(database_url: str, token: str) -> Callable:
+    """Returns a function getting a Baserow endpoint within the rate limit of its host
+
+    Raises:
+        BadRequestException: If Baserow returns an error
+    """
+    session = get_session(database_url)
+    host = get_host(database_url)
+
+    def get(path: str, params: dict | None = None):
+        response = rate_limit.send(
+            session, host, "GET", f"{database_url}/api/{path}",
+            headers={'Authorization': f'JWT {token}'},
+            params=params,
+            timeout=None)
+        if response.status_code != 200:
+            raise BadRequestException(response.json(), response.status_code)
+        return response.json()
+    return get
+
+
+def page_fetcher(get: Callable, table_id: int) -> Callable[[int], dict]:
+    """Returns a function getting a page of the table's rows by its number"""
+    def fetch(page: int) -> dict:
+        return get(f"database/rows/table/{table_id}/", {
+            'page': page, 'size': PAGE_SIZE, 'user_field_names': 'true'})
+    return fetch
+
+
+def iter_pages(fetch: Callable[[int], dict], first: dict) -> Iterator[list[dict]]:
+    """Yield rows of every page in order, fetching the next pages concurrently.
+
+    At most `prefetch` pages are held besides the one being written, so memory
+    doesn't grow with the size of the table.
+
+    Args:
+        fetch: returns the page with the given number
+        first: first page, already fetched to report errors before streaming
+    """
+    yield first['results']
+    pages = -(-first['count'] // PAGE_SIZE)
+    if pages <= 1:
+        return
+
+    prefetch = _settings['prefetch']
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+        numbers = iter(range(2, pages + 1))
+        pending = deque(executor.submit(fetch, number)
+                        for _, number in zip(range(prefetch), numbers))
+        while pending:
+            page = pending.popleft().result()
+            number = next(numbers, None)
+            if number is not None:
+                pending.append(executor.submit(fetch, number))
+            yield page['results']
+
+
+def csv_value(value) -> str:
+    """Returns a cell value of link row, select and file fields as plain text"""
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ", ".join(csv_value(item) for item in value)
+    if isinstance(value, dict):
+        return str(value.get('value', value.get('visible_name', value.get('name', ""))))
+    return str(value)
+
+
+def ndjson_lines(pages: Iterator[list[dict]], table_name: str | None = None) -> Iterator[str]:
+    """Yield one JSON line per row, with the table name for database exports"""
+    for rows in pages:
+        if table_name is None:
+            yield "".join(f"{json.dumps(row)}\n" for row in rows)
+        else:
+            yield "".join(f"{json.dumps({'table': table_name, 'row': row})}\n" for row in rows)
+
+
+def csv_lines(pages: Iterator[list[dict]], field_names: list[str]) -> Iterator[str]:
+    """Yield a header and one CSV line per row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    columns = ['id', *field_names]
+    writer.writerow(columns)
+    for rows in pages:
+        for row in rows:
+            writer.writerow([csv_value(row.get(column)) for column in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def abort_on_error(lines: Iterator[str], export_format: str) -> Iterator[str]:
+    """Yield lines of an export, ending it with an error record for NDJSON and
+    aborting the response if a page after the first can't be fetched.
+
+    The status was already sent with the first page, so the response is left
+    without its end for the client to see the export is incomplete.
+    """
+    try:
+        yield from lines
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        if isinstance(error, BadRequestException):
+            record = {'error': error.json, 'status': error.status_code}
+        else:
+            record = {'error': str(error), 'status': None}
+        print(f"Export aborted: {record}")
+        if export_format == 'ndjson':
+            yield f"{json.dumps(record)}\n"
+        raise
+
+
+def export_table(get: Callable, table_id: int, export_format: str) -> Iterator[str]:
+    """Start streaming every row of a table.
+
+    The first page is fetched before returning, so a missing table or an invalid
+    token is reported with its status code instead of an empty stream.
+
+    Raises:
+        BadRequestException: If Baserow returns an error
+    """
+    fetch = page_fetcher(get, table_id)
+    first = fetch(1)
+    pages = iter_pages(fetch, first)
+    if export_format == 'csv':
+        fields = get(f"database/fields/table/{table_id}/")
+        return abort_on_error(csv_lines(pages, [field['name'] for field in fields]), 'csv')
+    return abort_on_error(ndjson_lines(pages), 'ndjson')
+
+
+def export_database(get: Callable, database_id: int) -> Iterator[str]:
+    """Start streaming every row of every table in a database as NDJSON.
+
+    Raises:
+        BadRequestException: If tables of the database can't be listed
+    """
+    tables = get(f"database/tables/database/{database_id}/")
+
+    def lines():
+        for table in tables:
+            fetch = page_fetcher(get, table['id'])
+            yield from ndjson_lines(iter_pages(fetch, fetch(1)), table['name'])
+    return abort_on_error(lines(), 'ndjson')
@@ -0,0 +1,368 @@
+"""
+Module for importing CSV and NDJSON files into tables of generated databases.
+
+Columns are matched to fields by the name of the UML attribute the field was
+generated from, or by the field name. Values are checked against the field
+types before any request is sent, and rows are created with batch requests in
+the background. Rows that can't be imported are written to a report instead of
+stopping the import.
+
+"""
+import csv
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import IO
+from flask import Flask
+from app import db, upload_dir
+import app.xmi_reader as xr
+from app.models import ImportJob, UMLModel
+from app.row_batches import BATCH_SIZE, send_stream
+from app.jobs import error_message, track_job
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+# Commit progress at most this often to keep database writes low
+PROGRESS_INTERVAL = 1.0
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+TRUE_VALUES = ('true', 't', 'yes', 'y', '1')
+FALSE_VALUES = ('false', 'f', 'no', 'n', '0')
+
+EMAIL_PATTERN = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+# Characters Baserow allows in phone numbers
+PHONE_PATTERN = re.compile(r"[0-9NnXx,+._*()#=;/ -]{1,100}")
+
+Converter = Callable[[object], object]
+
+_executor = {
+    'pool': None,
+}
+
+
+def configure_row_import(workers: int = 1):
+    """Set the number of imports running at the same time"""
+    if _executor['pool'] is not None:
+        _executor['pool'].shutdown(wait=False)
+    _executor['pool'] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import")
+
+
+def imports_dir(user_id: int) -> str:
+    """Returns the directory of the user's uploaded imports and reports"""
+    return f"{upload_dir['path']}/user-{user_id}/imports"
+
+
+def report_path(user_id: int, job_id: int) -> str:
+    """Returns the path of the import's error report"""
+    return os.path.join(imports_dir(user_id), f"{job_id}.report.ndjson")
+
+
+def to_number(field: dict) -> Converter:
+    """Returns a converter checking decimal places and sign of numbers"""
+    places = field.get('number_decimal_places', 0)
+    negative = field.get('number_negative', True)
+
+    def convert(value):
+        if isinstance(value, bool):
+            raise ValueError("Expected a number")
+        try:
+            number = Decimal(str(value).strip())
+        except InvalidOperation as error:
+            raise ValueError("Expected a number") from error
+        if not number.is_finite():
+            raise ValueError("Expected a number")
+        if number.as_tuple().exponent < -places:
+            raise ValueError(f"Expected at most {places} decimal places")
+        if number < 0 and not negative:
+            raise ValueError("Expected a number that isn't negative")
+        return str(number)
+    return convert
+
+
+def to_rating(field: dict) -> Converter:
+    """Returns a converter checking ratings are within the maximum value"""
+    max_value = field.get('max_value', 5)
+
+    def convert(value):
+        try:
+            rating = int(str(value).strip())
+        except ValueError as error:
+            raise ValueError("Expected a whole number") from error
+        if not 0 <= rating <= max_value:
+            raise ValueError(f"Expected a rating from 0 to {max_value}")
+        return rating
+    return convert
+
+
+def to_boolean(value) -> bool:
+    """Returns the boolean of a JSON boolean or its text"""
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError("Expected true or false")
+
+
+def to_date(field: dict) -> Converter:
+    """Returns a converter checking ISO 8601 dates, with time if the field includes it"""
+    include_time = field.get('date_include_time', False)
+
+    def convert(value):
+        try:
+            if include_time:
+                return datetime.fromisoformat(str(value).strip()).isoformat()
+            return date.fromisoformat(str(value).strip()).isoformat()
+        except ValueError as error:
+            raise ValueError(
+                f"Expected an ISO 8601 {'date and time' if include_time else 'date'}") from error
+    return convert
+
+
+def to_pattern(pattern: re.Pattern, message: str) -> Converter:
+    """Returns a converter checking text matches the pattern"""
+    def convert(value):
+        text = str(value).strip()
+        if not pattern.fullmatch(text):
+            raise ValueError(message)
+        return text
+    return convert
+
+
+def to_select(field: dict, multiple: bool) -> Converter:
+    """Returns a converter replacing select option values with their ids.
+    Multiple values are given as a list or as text separated by commas."""
+    options = {option['value']: option['id'] for option in field.get('select_options', [])}
+
+    def option_id(value) -> int:
+        if value not in options:
+            raise ValueError(f"Unknown option {value!r}")
+        return options[value]
+
+    def convert(value):
+        if not multiple:
+            return option_id(str(value).strip())
+        values = value if isinstance(value, list) else str(value).split(",")
+        return [option_id(str(item).strip()) for item in values if str(item).strip()]
+    return convert
+
+
+def to_text(value) -> str:
+    """Returns text of any JSON value"""
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+# Converter factories of field types that can be written from a file
+FIELD_CONVERTERS: dict[str, Callable[[dict], Converter]] = {
+    'text': lambda field: to_text,
+    'long_text': lambda field: to_text,
+    'url': lambda field: to_text,
+    'number': to_number,
+    'rating': to_rating,
+    'boolean': lambda field: to_boolean,
+    'date': to_date,
+    'email': lambda field: to_pattern(EMAIL_PATTERN, "Expected an email address"),
+    'phone_number': lambda field: to_pattern(PHONE_PATTERN, "Expected a phone number"),
+    'single_select': lambda field: to_select(field, multiple=False),
+    'multiple_select': lambda field: to_select(field, multiple=True),
+}
+
+
+def field_converter(field: dict) -> Converter | None:
+    """Returns the converter of values for the field or `None` if the field
+    can't be written from a file"""
+    factory = FIELD_CONVERTERS.get(field['type'])
+    return factory(field) if factory is not None else None
+
+
+def import_columns(model: UMLModel, table_name: str, fields: list[dict]
+) -> dict[str, tuple[str, Converter | None]]:
+    """Match column names to fields of the table.
+
+    Args:
+        model: model whose XMI file has the table's class
+        table_name: name of the table
+        fields: fields of the table in Baserow
+
+    Returns:
+        Field name and value converter of every column name
+    """
+    by_name = {field['name']: field for field in fields}
+    columns = {name: (name, field_converter(field)) for name, field in by_name.items()}
+
+    try:
+        uml_model = xr.get_model(model.user_id, model.filename)
+    except FileNotFoundError:
+        # Columns can still be matched by field names
+        return columns
+    attributes = xr.get_attributes(uml_model)
+    for class_id, class_ in xr.get_classes(uml_model).items():
+        if xr.get_class_name(class_) != table_name:
+            continue
+        for attribute, field in zip(class_.attributes, attributes[class_id]):
+            if field['name'] in by_name:
+                columns[attribute.name] = columns[field['name']]
+    return columns
+
+
+def save_upload(stream: IO[bytes], user_id: int, file_format: str) -> str:
+    """Write the uploaded file to the user's imports without reading it into memory
+
+    Returns:
+        Path of the saved file
+    """
+    directory = imports_dir(user_id)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, path = tempfile.mkstemp(dir=directory, prefix="upload-", suffix=f".{file_format}")
+    with os.fdopen(descriptor, "wb") as file:
+        shutil.copyfileobj(stream, file, COPY_BUFFER_SIZE)
+    return path
+
+
+def unusable_columns(path: str, columns: dict) -> list[str]:
+    """Returns columns in the header of a CSV file that don't match a writable field"""
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        header = next(csv.reader(file), [])
+    return [name for name in header if columns.get(name, (None, None))[1] is None]
+
+
+def read_records(path: str, file_format: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """Yield the line number of every record with the record or the reason it
+    can't be read"""
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        if file_format == 'csv':
+            reader = csv.DictReader(file)
+            for record in reader:
+                if None in record:
+                    yield reader.line_num, None, "More values than columns"
+                else:
+                    yield reader.line_num, record, None
+            return
+
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_number, None, "Invalid JSON"
+                continue
+            if isinstance(record, dict):
+                yield line_number, record, None
+            else:
+                yield line_number, None, "Expected a JSON object"
+
+
+def convert_record(record: dict, columns: dict) -> tuple[dict, dict]:
+    """Convert values of a record to a row of the table.
+
+    Returns:
+        Row by field names and errors by column names
+    """
+    row, errors = {}, {}
+    for name, value in record.items():
+        field_name, convert = columns.get(name, (None, None))
+        if convert is None:
+            errors[name] = "Unknown column" if field_name is None else "Field can't be written"
+        elif value is not None and value != "":
+            try:
+                row[field_name] = convert(value)
+            except ValueError as error:
+                errors[name] = str(error)
+    return row, errors
+
+
+def submit_import(app: Flask,
+                  model: UMLModel,
+                  table_name: str,
+                  file_format: str,
+                  path: str,
+                  send: Callable,
+                  columns: dict) -> ImportJob:
+    """Queue the import of a saved file and return its job
+
+    Args:
+        send: sends a batch of rows to the table's batch endpoint
+        columns: field name and value converter of every column name
+    """
+    job = ImportJob(uml_model_id=model.id, table_name=table_name, file_format=file_format)
+    db.session.add(job)
+    db.session.commit()
+
+    track_job(ImportJob, job.id)
+    _executor['pool'].submit(
+        run_import, app, job.id, path, report_path(model.user_id, job.id), send, columns)
+    return job
+
+
+def run_import(app: Flask, job_id: int, path: str, report: str, send: Callable, columns: dict):
+    """Import rows of the file and record progress and failed rows in the job"""
+    with app.app_context():
+        job = db.session.get(ImportJob, job_id)
+        job.status = 'running'
+        db.session.commit()
+
+        last_commit = time.monotonic()
+        # Line numbers of rows sent and not yet answered
+        sent_lines = deque()
+
+        try:
+            with open(report, "w", encoding='utf-8') as report_file:
+                def reject(line: int, errors, status: int | None = None):
+                    job.failed += 1
+                    report_file.write(
+                        json.dumps({'line': line, 'status': status, 'errors': errors}) + "\n")
+
+                def batches() -> Iterator[list[dict]]:
+                    batch = []
+                    for line, record, error in read_records(path, job.file_format):
+                        job.rows += 1
+                        row, errors = convert_record(record, columns) if error is None \
+                            else ({}, {'record': error})
+                        if errors:
+                            reject(line, errors)
+                            continue
+                        batch.append(row)
+                        sent_lines.append(line)
+                        if len(batch) == BATCH_SIZE:
+                            yield batch
+                            batch = []
+                    if batch:
+                        yield batch
+
+                for results in send_stream(send, batches()):
+                    for result in results:
+                        line = sent_lines.popleft()
+                        if 'error' in result:
+                            reject(line, result['error'], result['status'])
+                        else:
+                            job.imported += 1
+                    if time.monotonic() - last_commit >= PROGRESS_INTERVAL:
+                        report_file.flush()
+                        db.session.commit()
+                        last_commit = time.monotonic()
+
+            job.status = 'succeeded'
+            db.session.commit()
+            print(f"Imported {job.imported} of {job.rows} rows into {job.table_name}")
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            db.session.rollback()
+            job = db.session.get(ImportJob, job_id)
+            job.status = 'failed'
+            job.error = error_message(error)
+            db.session.commit()
+        finally:
+            os.remove(path)
+            track_job(ImportJob, job_id, active=False)
+            db.session.remove()
@@ -0,0 +1,112 @@
+"""
+Module for running Baserow calls concurrently while respecting their dependencies.
+
+"""
+from collections import deque
+from collections.abc import Callable, Hashable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Task:
+    """A call waiting for the results of other tasks"""
+    func: Callable
+    args: tuple
+    after: tuple[Hashable, ...]
+    on_done: Callable | None = None
+    waits_for: tuple[Hashable, ...] = ()
+    waiting: set = field(default_factory=set)
+
+
+class Scheduler:
+    """
+    A dependency graph of calls run on a bounded worker pool.
+
+    Every task is called with its own arguments followed by the results of the
+    tasks it runs after. `on_done` callbacks are run in the thread calling `run`,
+    so they can safely use the database session.
+
+    """
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+        self.tasks: dict[Hashable, Task] = {}
+        self.completed: dict[Hashable, object] = {}
+
+    def add(self,
+            key: Hashable,
+            func: Callable,
+            *args,
+            after: Iterable[Hashable] = (),
+            on_done: Callable | None = None,
+            waits_for: Iterable[Hashable] = ()):
+        """Add a task which starts once all tasks in `after` are done.
+        Tasks in `waits_for` are also waited for, without passing their results."""
+        if key in self.tasks or key in self.completed:
+            raise KeyError(f"Task {key} already added")
+        self.tasks[key] = Task(func, args, tuple(after), on_done, tuple(waits_for))
+
+    def complete(self, key: Hashable, result: object):
+        """Add a task which is already done with the given result"""
+        if key in self.tasks or key in self.completed:
+            raise KeyError(f"Task {key} already added")
+        self.completed[key] = result
+
+    def run(self, on_progress: Callable[[int, int], None] | None = None
+    ) -> dict[Hashable, object]:
+        """Run all tasks and return their results by key.
+
+        The first exception raised by a task stops scheduling new tasks, waits for
+        the running ones (still calling their `on_done`) and is raised again.
+
+        Args:
+            on_progress: called with the number of completed and all tasks after
+                every completed task
+        """
+        results = dict(self.completed)
+        total = len(self.tasks) + len(self.completed)
+        dependants: dict[Hashable, list[Hashable]] = {key: [] for key in self.tasks}
+        ready = deque()
+        for key, task in self.tasks.items():
+            task.waiting = {*task.after, *task.waits_for} - self.completed.keys()
+            for dependency in task.waiting:
+                dependants[dependency].append(key)
+            if not task.waiting:
+                ready.append(key)
+
+        running: dict[Future, Hashable] = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while ready or running:
+                while ready and error is None:
+                    key = ready.popleft()
+                    task = self.tasks[key]
+                    args = (*task.args, *(results[dependency] for dependency in task.after))
+                    running[executor.submit(task.func, *args)] = key
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                        continue
+
+                    # Tasks finishing after an error are still reported as done
+                    results[key] = future.result()
+                    task = self.tasks[key]
+                    if task.on_done is not None:
+                        task.on_done(results[key])
+                    if error is not None:
+                        continue
+                    for dependant in dependants[key]:
+                        self.tasks[dependant].waiting.discard(key)
+                        if not self.tasks[dependant].waiting:
+                            ready.append(dependant)
+                    if on_progress is not None:
+                        on_progress(len(results), total)
+
+        if error is not None:
+            raise error
+        return results
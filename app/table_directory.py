@@ -0,0 +1,62 @@
+"""
+Module for caching table ids of generated databases by table name.
+
+"""
+import time
+from collections.abc import Callable
+from threading import Lock
+
+# Refresh a directory on an unknown table name at most this often
+MIN_REFRESH_INTERVAL = 5.0
+
+_settings = {
+    'ttl': 300.0,
+}
+# Time each directory was filled, version of the tables it was filled at and table ids
+_directories: dict[int, tuple[float, object, dict[str, int]]] = {}
+_lock = Lock()
+
+
+def configure_table_directory(ttl: float = 300.0):
+    """Set seconds a table directory is used before its tables are listed again"""
+    with _lock:
+        _settings['ttl'] = ttl
+        _directories.clear()
+
+
+def get_table_id(model_id: int,
+                 table_name: str,
+                 list_tables: Callable[[], list[dict]],
+                 version: object = None) -> int | None:
+    """Get the id of the model's table with the given name.
+
+    Tables are listed only if the model's directory expired or was filled at
+    another version, or if the name is unknown and the directory wasn't
+    refreshed in the last few seconds.
+
+    Args:
+        model_id: model whose database has the table
+        table_name: name of the table
+        list_tables: returns tables of the model's database from Baserow
+        version: changes whenever tables may have changed in any process
+
+    Returns:
+        Table id or `None` if the database has no table with the name
+    """
+    now = time.monotonic()
+    with _lock:
+        filled, filled_version, tables = _directories.get(model_id, (None, None, None))
+    if filled is not None and now - filled < _settings['ttl'] and filled_version == version:
+        if table_name in tables or now - filled < MIN_REFRESH_INTERVAL:
+            return tables.get(table_name)
+
+    tables = {table['name']: table['id'] for table in list_tables()}
+    with _lock:
+        _directories[model_id] = (time.monotonic(), version, tables)
+    return tables.get(table_name)
+
+
+def invalidate(model_id: int):
+    """Drop the directory of a model whose tables were created, renamed or deleted"""
+    with _lock:
+        _directories.pop(model_id, None)
@@ -3,26 +3,58 @@ Package for generating parts of a UML model.
 
 Get:
 
+- compiled model
+- content hash of an XMI file
 - classes
 - class names
 - data types
 - enumerations
 - attributes
+- content hash of the type mappings
 - associations
 
 """
+from app.xmi_reader.records import (
+    UMLAttribute,
+    AssociationEnd,
+    UMLClass,
+    UMLDataType,
+    UMLEnumeration
+)
 from app.xmi_reader.packaged_elements import get_packaged_elements
+from app.xmi_reader.model import CompiledModel, compile_model, read_model
+from app.xmi_reader.cache import configure_cache, get_model, get_digest, invalidate
 from app.xmi_reader.classes import get_classes
 from app.xmi_reader.data_types import get_data_types, get_enumerations
-from app.xmi_reader.attributes import get_attributes
+from app.xmi_reader.attributes import (
+    get_attributes,
+    get_type_mappings_digest,
+    register_type_mapping,
+    register_type_mappings
+)
 from app.xmi_reader.associations import get_associations, get_class_name
 
 __all__ = [
+    'UMLAttribute',
+    'AssociationEnd',
+    'UMLClass',
+    'UMLDataType',
+    'UMLEnumeration',
     'get_packaged_elements',
+    'CompiledModel',
+    'compile_model',
+    'read_model',
+    'configure_cache',
+    'get_model',
+    'get_digest',
+    'invalidate',
     'get_classes',
     'get_class_name',
     'get_data_types',
     'get_enumerations',
     'get_attributes',
+    'get_type_mappings_digest',
+    'register_type_mapping',
+    'register_type_mappings',
     'get_associations',
 ]
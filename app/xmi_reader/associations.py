@@ -1,15 +1,16 @@
 """Generates a dictionary with lists of associations for each class. """
-from xml.dom.minidom import Element
+from app.xmi_reader.model import CompiledModel
+from app.xmi_reader.records import AssociationEnd, UMLClass
 
 
-def get_navigable(end: Element) -> bool | None:
+def get_navigable(end: AssociationEnd) -> bool | None:
     """
     Returns a boolean value of end's attribute 'is_navigable' or `None` if the attribute not
     defined.
     """
-    if end.getAttribute("isNavigable") == "true":
+    if end.navigable == "true":
         return True
-    if end.getAttribute("isNavigable") == "false":
+    if end.navigable == "false":
         return False
     return None
 
@@ -76,43 +77,50 @@ def solve_navigable(ends: list[dict],
     # print("Case 4")
 
 
-def get_class_name(class_: Element) -> str:
+def get_class_name(class_: UMLClass) -> str:
     """Get the filtered name of the given class 
 
     Args:
-        class_ (Element): current class
+        class_ (UMLClass): current class
 
     Returns:
         str: filtered name of the class
     """
-    return class_.getAttribute('name').replace('%20', '_').lower()
+    return class_.name.replace('%20', '_').lower()
 
 
-def get_associations(classes: dict[str, Element]) -> dict[str, list]:
+def get_associations(model: CompiledModel) -> dict[str, list]:
     """Generates a dictionary with lists of associations for each class.
 
     Args:
-        classes (dict[str, Element]): a dictionary of classes
+        model (CompiledModel): a compiled model with indexed classes
 
     Returns:
         dict[str, list]: a new dictionary with lists of associations for each class
     """
+    classes = model.classes
     class_associations = {id: [] for id in classes.keys()}
+    # Associations repeated under several classes are solved only once
+    solved: set[frozenset[str]] = set()
 
     for id_, class_ in classes.items():
         # print("---------------------------------------------------------")
         # print()
         # print("CLASS:", get_class_name(classes[id_]))
         # print()
-        owned_members = class_.getElementsByTagName("ownedMember")
-        owned_ends = (member.getElementsByTagName("ownedEnd") for member in owned_members)
+        for pair in class_.ends:
+            association_key = frozenset(end.id for end in pair)
+            if association_key in solved:
+                continue
+            solved.add(association_key)
 
-        for pair in owned_ends:
             ends = [{
-                "name": curr.getAttribute("name").title().replace("_", " "),
-                "class_id": curr.getAttribute("type"),
-                "class_name": get_class_name(classes[curr.getAttribute("type")]),
-                "aggregation": curr.getAttribute("aggregation"),
+                "association_id": ":".join(end.id for end in pair),
+                "end_id": curr.id,
+                "name": curr.name.title().replace("_", " "),
+                "class_id": curr.class_id,
+                "class_name": get_class_name(classes[curr.class_id]),
+                "aggregation": curr.aggregation,
                 "is_navigable": get_navigable(curr)
             } for curr in pair]
 
@@ -122,4 +130,43 @@ def get_associations(classes: dict[str, Element]) -> dict[str, list]:
             #     print(get_class_name(classes[class_id]), "->", assoc)
             # print()
 
-    return class_associations
+    return canonical_links(classes, class_associations)
+
+
+def canonical_links(classes: dict[str, UMLClass],
+                    class_associations: dict[str, list]
+) -> dict[str, list]:
+    """Keep one association per link row field of the same association.
+
+    Both ends of an association can describe the same link, e.g. both ends of
+    case 3 of `solve_navigable` pointing to the same class, or an end whose field
+    is the related field Baserow adds on the other side of the first end. Only
+    such mirror pairs are dropped, each with a log line. Links of different
+    associations are always kept, even if their names match.
+
+    Args:
+        classes: classes by their identifier
+        class_associations: associations of each class found by `solve_navigable`
+
+    Returns:
+        dict[str, list]: associations of each class, one per link row field
+    """
+    fields: dict[tuple[str, str, str, str], str] = {}
+    links = {class_id: [] for class_id in class_associations}
+    for class_id, associations in class_associations.items():
+        for association in associations:
+            association_id = association['association_id']
+            target_id = association['class_id']
+            name = association['name'] or association['class_name']
+            field = (association_id, class_id, name, target_id)
+            if field in fields:
+                print(f"Dropped link {name} of {get_class_name(classes[class_id])} "
+                      f"(end {association['end_id']}), it mirrors end {fields[field]}")
+                continue
+            fields[field] = association['end_id']
+            links[class_id].append(association)
+            if association.get('has_related_field') is not False and target_id != class_id:
+                related_field = (
+                    association_id, target_id, get_class_name(classes[class_id]), class_id)
+                fields[related_field] = association['end_id']
+    return links
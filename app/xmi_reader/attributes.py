@@ -1,6 +1,11 @@
 """Module for generating fields associated by attributes in UML model"""
-from xml.dom.minidom import Element
+import hashlib
+import json
 import random
+from collections.abc import Callable
+from copy import deepcopy
+from app.xmi_reader.model import CompiledModel, normalize_type_name
+from app.xmi_reader.records import UMLEnumeration
 
 COLORS = (
     "light-blue", "blue", "dark-blue",
@@ -14,128 +19,129 @@ DATE_FORMAT = "EU"
 TIMEZONE = "Europe/Zagreb"
 
 
-def get_field(enumerations: list[dict], name: str, type_: str) -> dict:
-    """ Create a new field based on the attribute. """
-    field = {}
-    field["name"] = name.title().replace("_", " ")
-    lower_name = type_.lower()
-
-    # Handling Number Type
-    if lower_name in ("integer", "int", "unsigned integer",
-                      "unsigned int", "float", "real", "double"):
-        field["type"] = "number"
-        field["number_decimal_places"] = 0
-        field["number_negative"] = lower_name not in ("unsigned integer", "unsigned int")
-        field["number_decimal_places"] = 5 if lower_name in ("float", "real", "double") else 0
-
-    # Handling Long Text Type
-    elif lower_name in ("blob", "long text"):
-        field["type"] = "long_text"
-
-    # Handling URL Type
-    elif lower_name == "url":
-        field["type"] = "url"
-
-    # Handling Email Type
-    elif lower_name == "email":
-        field["type"] = "email"
-
-    # Handling Rating Type
-    elif lower_name == "rating":
-        field["type"] = "rating"
-        field["max_value"] = 5
-        field["color"] = "yellow"
-        field["style"] = "star"
-
-    # Handling Boolean Type
-    elif lower_name in ("boolean", "bool"):
-        field["type"] = "boolean"
-
-    # Handling Date
-    elif lower_name == "date":
-        field["type"] = "date"
-        field["date_format"] = DATE_FORMAT
-        field["date_include_time"] = False
-
-    elif lower_name in ("time", "datetime"):
-        field["type"] = "date"
-        field["date_format"] = DATE_FORMAT
-        field["date_include_time"] = True
-        field["date_time_format"] = "24"
-
-    # Handling Last Modified Type
-    elif lower_name == "last modified":
-        field["type"] = "last_modified"
-        field["date_format"] = DATE_FORMAT
-        field["date_include_time"] = False
-        field["date_include_time"] = True
-        field["timezone"] = TIMEZONE
-
-    # Handling Created On Type
-    elif lower_name == "created on":
-        field["type"] = "created_on"
-        field["date_format"] = DATE_FORMAT
-        field["date_include_time"] = False
-        field["date_include_time"] = True
-        field["timezone"] = TIMEZONE
-
-    # Handling File Type
-    elif lower_name == "file":
-        field["type"] = "file"
-
-    # Handling Phone Number Type
-    elif lower_name in ("phone", "phone number", "telephone", "telephone number"):
-        field["type"] = "phone_number"
-
-    # Handling Multiple_Collaborators Type
-    elif lower_name in ("collaborators", "multiple collaborators"):
-        field["type"] = "multiple_collaborators"
+FieldFactory = Callable[[], dict]
+
+
+def field_template(**template) -> FieldFactory:
+    """Returns a factory creating a new copy of the given Baserow field template"""
+    return lambda: deepcopy(template)
+
+
+NUMBER = field_template(type="number", number_decimal_places=0, number_negative=True)
+UNSIGNED_NUMBER = field_template(type="number", number_decimal_places=0, number_negative=False)
+DECIMAL_NUMBER = field_template(type="number", number_decimal_places=5, number_negative=True)
+LONG_TEXT = field_template(type="long_text")
+DATE = field_template(type="date", date_format=DATE_FORMAT, date_include_time=False)
+DATE_TIME = field_template(
+    type="date", date_format=DATE_FORMAT, date_include_time=True, date_time_format="24")
+PHONE_NUMBER = field_template(type="phone_number")
+BOOLEAN = field_template(type="boolean")
+MULTIPLE_COLLABORATORS = field_template(type="multiple_collaborators")
+
+TYPE_MAPPINGS: dict[str, FieldFactory] = {
+    "integer": NUMBER,
+    "int": NUMBER,
+    "unsigned integer": UNSIGNED_NUMBER,
+    "unsigned int": UNSIGNED_NUMBER,
+    "float": DECIMAL_NUMBER,
+    "real": DECIMAL_NUMBER,
+    "double": DECIMAL_NUMBER,
+    "blob": LONG_TEXT,
+    "long text": LONG_TEXT,
+    "url": field_template(type="url"),
+    "email": field_template(type="email"),
+    "rating": field_template(type="rating", max_value=5, color="yellow", style="star"),
+    "boolean": BOOLEAN,
+    "bool": BOOLEAN,
+    "date": DATE,
+    "time": DATE_TIME,
+    "datetime": DATE_TIME,
+    "last modified": field_template(
+        type="last_modified", date_format=DATE_FORMAT, date_include_time=True, timezone=TIMEZONE),
+    "created on": field_template(
+        type="created_on", date_format=DATE_FORMAT, date_include_time=True, timezone=TIMEZONE),
+    "file": field_template(type="file"),
+    "phone": PHONE_NUMBER,
+    "phone number": PHONE_NUMBER,
+    "telephone": PHONE_NUMBER,
+    "telephone number": PHONE_NUMBER,
+    "collaborators": MULTIPLE_COLLABORATORS,
+    "multiple collaborators": MULTIPLE_COLLABORATORS,
+}
+
+
+def register_type_mapping(type_: str, template: dict | FieldFactory):
+    """Map a UML type name to a Baserow field template or a factory of field templates.
+    Replaces an existing mapping of the same type."""
+    factory = template if callable(template) else field_template(**template)
+    TYPE_MAPPINGS[normalize_type_name(type_)] = factory
+
+
+def register_type_mappings(mappings: dict[str, dict]):
+    """Register all given type mappings, e.g. from the `XMI_TYPE_MAPPINGS` config"""
+    for type_, template in mappings.items():
+        register_type_mapping(type_, template)
+
+
+def get_type_mappings_digest() -> str:
+    """Returns a SHA-256 hash of the field templates of all mapped types, which
+    changes whenever a type mapping is registered or replaced"""
+    templates = {type_: factory() for type_, factory in TYPE_MAPPINGS.items()}
+    content = json.dumps(templates, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def get_field(enumerations: dict[str, UMLEnumeration], name: str, type_: str) -> dict:
+    """ Create a new field based on the attribute.
+
+    Args:
+        enumerations: enumerations by their normalized name
+        name: attribute name
+        type_: name of the attribute's data type
+    """
+    normalized_type = normalize_type_name(type_)
+    factory = TYPE_MAPPINGS.get(normalized_type)
+
+    if factory is not None:
+        field = {"name": name.title().replace("_", " "), **factory()}
 
     # Handling Multiple Select Type
-    elif lower_name in (enum["name"].lower() for enum in enumerations):
-        exact_enum = next(enum for enum in enumerations if enum["name"] == type_)
-        field["type"] = "multiple_select"
+    elif normalized_type in enumerations:
+        field = {"name": name.title().replace("_", " "), "type": "multiple_select"}
         field["select_options"] = [{
             "value": value,
             "color": random.choice(COLORS)
-        } for value in exact_enum["literals"]]
+        } for value in enumerations[normalized_type].literals]
 
     # If a Data Type is not defined or is a string, it's just a text
     else:
-        field["type"] = "text"
-        # field["text_default"] = ""
+        field = {"name": name.title().replace("_", " "), "type": "text"}
 
     return field
 
 
-def get_attributes(classes: dict[str, Element],
-                   data_types: list[dict],
-                   enumerations: list[dict]
-) -> dict[str, list]:
+def get_attributes(model: CompiledModel) -> dict[str, list]:
     """Generates a dictionary of class attributes for each class.
 
     Args:
-        classes: Dictionary of classes with their ID
-        data_types: list of all data types
-        enumerations: list of all enumerations
+        model: Compiled model with indexed classes, data types and enumerations
 
     Returns:
         A dictionary of lists of class attributes for each class identifier
     """
 
-    class_attributes = {_id: [] for _id in classes.keys()}
-
-    for _id, _class in classes.items():
-        owned_attributes = _class.getElementsByTagName("ownedAttribute")
+    class_attributes = {_id: [] for _id in model.classes.keys()}
 
-        for attribute in owned_attributes:
+    for _id, _class in model.classes.items():
+        for attribute in _class.attributes:
             found_type = ""
-            if attribute.getAttribute("type") != "":
-                found_type = next(data_type["name"] for data_type in data_types
-                                  if data_type["id"] == attribute.getAttribute("type"))
+            if attribute.type != "":
+                data_type = (model.data_types.get(attribute.type)
+                             or model.enumerations.get(attribute.type))
+                found_type = data_type.name if data_type else ""
 
             class_attributes[_id].append(get_field(
-                enumerations, attribute.getAttribute("name"), found_type
+                model.enumerations_by_name, attribute.name, found_type
             ))
 
     return class_attributes
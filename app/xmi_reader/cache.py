@@ -0,0 +1,152 @@
+"""Module for caching compiled models by the content hash of their XMI file"""
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from threading import Lock
+from app.xmi_reader.packaged_elements import UPLOAD_DIR, iter_packaged_elements
+from app.xmi_reader.model import CompiledModel, compile_model
+
+# Bump whenever the pickled layout of a compiled model changes
+CACHE_VERSION = 3
+
+CHUNK_SIZE = 1 << 20
+
+_settings = {
+    'size': 32,
+    'path': None,
+}
+_lock = Lock()
+_models: OrderedDict[str, CompiledModel] = OrderedDict()
+_digests: dict[str, tuple[int, int, str]] = {}
+
+
+def configure_cache(size: int = 32, path: str | None = None):
+    """Set the number of models kept in memory and an optional shared directory
+    for serialized models. Clears the in-memory tier."""
+    if path and not os.path.exists(path):
+        os.makedirs(path)
+
+    with _lock:
+        _settings['size'] = size
+        _settings['path'] = path
+        _models.clear()
+        _digests.clear()
+
+
+def file_digest(path: str) -> str:
+    """Returns a SHA-256 hash of the file content, reusing it while the file is unchanged"""
+    stat = os.stat(path)
+    with _lock:
+        known = _digests.get(path)
+    if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+        return known[2]
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    with _lock:
+        _digests[path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def _disk_path(digest: str) -> str | None:
+    if not _settings['path']:
+        return None
+    return os.path.join(_settings['path'], f"{digest}-v{CACHE_VERSION}.pickle")
+
+
+def _remember(digest: str, model: CompiledModel):
+    with _lock:
+        _models[digest] = model
+        _models.move_to_end(digest)
+        while len(_models) > _settings['size']:
+            _models.popitem(last=False)
+
+
+def _load(digest: str) -> CompiledModel | None:
+    with _lock:
+        model = _models.get(digest)
+        if model is not None:
+            _models.move_to_end(digest)
+            return model
+
+    disk_path = _disk_path(digest)
+    if disk_path is None or not os.path.isfile(disk_path):
+        return None
+    try:
+        with open(disk_path, "rb") as file:
+            model = pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+    _remember(digest, model)
+    return model
+
+
+def _store(digest: str, model: CompiledModel):
+    _remember(digest, model)
+
+    disk_path = _disk_path(digest)
+    if disk_path is None:
+        return
+    # Write to a temporary file first so other workers never read a partial pickle
+    descriptor, temp_path = tempfile.mkstemp(dir=_settings['path'], suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            pickle.dump(model, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, disk_path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def get_model(user_id: int, xmi_file: str) -> CompiledModel:
+    """Get a compiled model of the XMI file, parsing it only if the same content
+    was not compiled before. The returned model is shared and must not be modified.
+
+    Raises:
+        KeyError: If XMI file is not specified
+    """
+
+    if xmi_file is None:
+        raise KeyError('XMI file not specified')
+
+    path = f"{UPLOAD_DIR}/user-{user_id}/{xmi_file}"
+    digest = file_digest(path)
+    model = _load(digest)
+    if model is None:
+        model = compile_model(iter_packaged_elements(path))
+        _store(digest, model)
+    return model
+
+
+def get_digest(user_id: int, xmi_file: str) -> str:
+    """Returns the content hash of the XMI file
+
+    Raises:
+        KeyError: If XMI file is not specified
+    """
+    if xmi_file is None:
+        raise KeyError('XMI file not specified')
+    return file_digest(f"{UPLOAD_DIR}/user-{user_id}/{xmi_file}")
+
+
+def invalidate(user_id: int, xmi_file: str):
+    """Drop the cached model of the XMI file from every tier"""
+    path = f"{UPLOAD_DIR}/user-{user_id}/{xmi_file}"
+    with _lock:
+        known = _digests.pop(path, None)
+        if known is not None:
+            _models.pop(known[2], None)
+
+    disk_path = _disk_path(known[2]) if known is not None else None
+    if disk_path is not None and os.path.isfile(disk_path):
+        try:
+            os.remove(disk_path)
+        except FileNotFoundError:
+            pass
@@ -1,14 +1,9 @@
 """Module for generating a dictionary of classes with their associated id."""
-from xml.dom.minicompat import NodeList
-from xml.dom.minidom import Element
+from app.xmi_reader.model import CompiledModel
+from app.xmi_reader.records import UMLClass
 
 
-def get_classes(packaged_elements: NodeList[Element]) -> dict[str, Element]:
-    """Returns a dictionary of classes with their matching ID based on provided packaged
-    elements."""
+def get_classes(model: CompiledModel) -> dict[str, UMLClass]:
+    """Returns a dictionary of classes with their matching ID based on the compiled model."""
 
-    return {
-        element.getAttribute("xmi:id"): element
-        for element in packaged_elements
-        if element.getAttribute("xmi:type") == "uml:Class"
-    }
+    return model.classes
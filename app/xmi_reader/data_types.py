@@ -1,9 +1,8 @@
 """Module for generating enumerations and data types."""
-from xml.dom.minicompat import NodeList
-from xml.dom.minidom import Element
+from app.xmi_reader.model import CompiledModel
 
 
-def get_enumerations(packaged_elements: NodeList[Element]) -> list[dict]:
+def get_enumerations(model: CompiledModel) -> list[dict]:
     """Generates a list of all enumerations used in a model.
 
     Every dictionary in a list represents a single enumeration and contains:
@@ -16,27 +15,20 @@ def get_enumerations(packaged_elements: NodeList[Element]) -> list[dict]:
         {'id': 'AAAAAAGD1hiG1uaORTo=', 'name': 'Gender', 'literals': {'Male', 'Female'}}
 
     Args:
-        packaged_elements: Elements from `<uml:Model>` with a tag
-            `<packagedElement>`
+        model: Compiled model of the XMI file
 
     Returns:
         A list of all enumerations used in a model
     """
 
-    enumerations = (element for element in packaged_elements
-                    if element.getAttribute("xmi:type") == "uml:Enumeration")
-
     return [{
-        "id": enum.getAttribute("xmi:id"),
-        "name": enum.getAttribute("name"),
-        "literals": {
-            literal.getAttribute("name")
-            for literal in enum.getElementsByTagName("ownedLiteral")
-        }
-    } for enum in enumerations]
+        "id": enum.id,
+        "name": enum.name,
+        "literals": set(enum.literals)
+    } for enum in model.enumerations.values()]
 
 
-def get_data_types(packaged_elements: NodeList[Element]) -> list[dict]:
+def get_data_types(model: CompiledModel) -> list[dict]:
     """Generates a list of all data types used in a model.
 
     Every dictionary in a list represents a single enumeration and contains:
@@ -44,21 +36,17 @@ def get_data_types(packaged_elements: NodeList[Element]) -> list[dict]:
         name (`str`): data type name
     
     Examples:
-        >>> get_data_types(packaged_elements)[0]
+        >>> get_data_types(model)[0]
         {'id': 'AAAAAAGD1hiG1uaORTo=', 'name': 'Integer'}
 
     Args:
-        packaged_elements: Elements from `<uml:Model>` with a tag
-            `<packagedElement>`
+        model: Compiled model of the XMI file
 
     Returns:
         A list of all data types used in a model
     """
 
-    data_types = (element for element in packaged_elements
-                          if element.getAttribute("xmi:type") == "uml:DataType")
-
     return [{
-        "id":  data_type.getAttribute("xmi:id"),
-        "name" : data_type.getAttribute("name")
-    } for data_type in data_types]
+        "id":  data_type.id,
+        "name" : data_type.name
+    } for data_type in model.data_types.values()]
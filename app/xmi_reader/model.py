@@ -0,0 +1,70 @@
+"""Module for compiling packaged elements into an indexed UML model."""
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from app.xmi_reader.packaged_elements import (
+    UPLOAD_DIR,
+    PackagedElement,
+    iter_packaged_elements
+)
+from app.xmi_reader.records import (
+    AssociationEnd,
+    UMLClass,
+    UMLDataType,
+    UMLEnumeration
+)
+
+
+def normalize_type_name(type_: str) -> str:
+    """Normalize a UML type name for case-insensitive lookups"""
+    return " ".join(type_.lower().replace("_", " ").split())
+
+
+@dataclass
+class CompiledModel:
+    """UML model with id-keyed indexes shared by all extractors.
+
+    Attributes:
+        classes: classes by their identifier, in document order
+        data_types: data types by their identifier
+        enumerations: enumerations by their identifier
+        enumerations_by_name: enumerations by their case-insensitive name, see
+            `normalize_type_name`
+        ends: owned association ends by their identifier
+    """
+    classes: dict[str, UMLClass] = field(default_factory=dict)
+    data_types: dict[str, UMLDataType] = field(default_factory=dict)
+    enumerations: dict[str, UMLEnumeration] = field(default_factory=dict)
+    enumerations_by_name: dict[str, UMLEnumeration] = field(default_factory=dict)
+    ends: dict[str, AssociationEnd] = field(default_factory=dict)
+
+
+def compile_model(packaged_elements: Iterable[PackagedElement]) -> CompiledModel:
+    """Builds all indexes of a model in a single pass over the packaged elements."""
+    model = CompiledModel()
+
+    for element in packaged_elements:
+        if isinstance(element, UMLClass):
+            model.classes[element.id] = element
+            for pair in element.ends:
+                for end in pair:
+                    model.ends[end.id] = end
+        elif isinstance(element, UMLDataType):
+            model.data_types[element.id] = element
+        elif isinstance(element, UMLEnumeration):
+            model.enumerations[element.id] = element
+            model.enumerations_by_name.setdefault(normalize_type_name(element.name), element)
+
+    return model
+
+
+def read_model(user_id: int, xmi_file: str) -> CompiledModel:
+    """Stream the XMI file straight into a compiled model
+
+    Raises:
+        KeyError: If XMI file is not specified
+    """
+
+    if xmi_file is None:
+        raise KeyError('XMI file not specified')
+
+    return compile_model(iter_packaged_elements(f"{UPLOAD_DIR}/user-{user_id}/{xmi_file}"))
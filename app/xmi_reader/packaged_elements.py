@@ -1,16 +1,124 @@
-"""Module for initializing DOM object of the given XMI file"""
-from xml.dom.minidom import parse, Element
-from xml.dom.minicompat import NodeList
+"""Module for streaming packaged elements out of the given XMI file"""
+from collections.abc import Iterator
+from sys import intern
+from xml.etree.ElementTree import iterparse
 from app import upload_dir
+from app.xmi_reader.records import (
+    UMLClass,
+    UMLDataType,
+    UMLEnumeration,
+    new_attribute,
+    new_end
+)
 
 UPLOAD_DIR = upload_dir['path']
 
-def get_packaged_elements(user_id: int, xmi_file: str) -> NodeList[Element]:
+PackagedElement = UMLClass | UMLDataType | UMLEnumeration
+
+
+def local_name(tag: str) -> str:
+    """Returns a tag or an attribute name without its namespace"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def new_record(element_type: str, id_: str, name: str) -> PackagedElement | None:
+    """Create an empty record for a packaged element or `None` if its type is not used"""
+    if element_type == "uml:Class":
+        return UMLClass(id_, name)
+    if element_type == "uml:DataType":
+        return UMLDataType(id_, intern(name))
+    if element_type == "uml:Enumeration":
+        return UMLEnumeration(id_, intern(name))
+    return None
+
+
+def iter_packaged_elements(path: str) -> Iterator[PackagedElement]:
+    """Stream classes, data types and enumerations from the XMI file in a single pass.
+
+    Every element is read from its start tag and cleared as soon as its end tag is
+    reached, so only the currently open branch of the document is kept in memory.
+    Classes, data types and enumerations are yielded as `UMLClass`, `UMLDataType`
+    and `UMLEnumeration` records.
+
+    Args:
+        path: path to the XMI file
+
+    Yields:
+        Packaged elements of `<uml:Model>` in document order
+    """
+    xmi_ns = ""
+    xmi_id = xmi_type = ""
+    parents = []
+    records = []
+    model_depth = 0
+    ends = None
+
+    for event, elem in iterparse(path, events=("start-ns", "start", "end")):
+        if event == "start-ns":
+            prefix, uri = elem
+            if prefix == "xmi":
+                xmi_ns = f"{{{uri}}}"
+                xmi_id, xmi_type = f"{xmi_ns}id", f"{xmi_ns}type"
+            continue
+
+        tag = local_name(elem.tag)
+
+        if event == "start":
+            parents.append(elem)
+            if tag == "Model":
+                model_depth += 1
+            if not model_depth:
+                continue
+
+            record = records[-1] if records else None
+            if tag == "packagedElement":
+                records.append(new_record(
+                    elem.get(xmi_type, ""),
+                    elem.get(xmi_id, ""),
+                    elem.get("name", "")))
+            elif isinstance(record, UMLClass):
+                if tag == "ownedAttribute":
+                    record.attributes.append(new_attribute(
+                        elem.get(xmi_id, ""),
+                        elem.get("name", ""),
+                        elem.get("type", "")))
+                elif tag == "ownedMember":
+                    ends = []
+                    record.ends.append(ends)
+                elif tag == "ownedEnd" and ends is not None:
+                    ends.append(new_end(
+                        elem.get(xmi_id, ""),
+                        elem.get("name", ""),
+                        elem.get("type", ""),
+                        elem.get("aggregation", ""),
+                        elem.get("isNavigable", "")))
+            elif isinstance(record, UMLEnumeration) and tag == "ownedLiteral":
+                record.literals.append(elem.get("name", ""))
+            continue
+
+        # Free the subtree and detach it from its parent once it's been consumed
+        parents.pop()
+        elem.clear()
+        if parents:
+            parents[-1].remove(elem)
+
+        if tag == "Model":
+            model_depth -= 1
+        elif tag == "ownedMember":
+            ends = None
+        elif tag == "packagedElement" and model_depth:
+            record = records.pop()
+            if record is not None:
+                yield record
+
+
+def get_packaged_elements(user_id: int, xmi_file: str) -> list[PackagedElement]:
     """Get all packaged elements from the XMI file
 
     Returns:
-        All elements in <'uml:Model'> with a tag '<packagedElements'>
-    
+        All classes, data types and enumerations in <'uml:Model'> with a tag
+        '<packagedElement'>
+
     Raises:
         KeyError: If XMI file is not specified
     """
@@ -18,8 +126,4 @@ def get_packaged_elements(user_id: int, xmi_file: str) -> NodeList[Element]:
     if xmi_file is None:
         raise KeyError('XMI file not specified')
 
-    file = parse(f"{UPLOAD_DIR}/user-{user_id}/{xmi_file}")
-    xmi = file.firstChild
-    # doc = xmi.firstChild
-    model = xmi.getElementsByTagName("uml:Model")[0]
-    return model.getElementsByTagName("packagedElement")
+    return list(iter_packaged_elements(f"{UPLOAD_DIR}/user-{user_id}/{xmi_file}"))
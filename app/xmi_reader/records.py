@@ -0,0 +1,65 @@
+"""Compact records for the elements of a UML model.
+
+Repeated strings such as type identifiers and aggregation kinds are interned, so
+every record of a large model points to the same string objects.
+"""
+from dataclasses import dataclass, field
+from sys import intern
+
+
+@dataclass(slots=True)
+class UMLAttribute:
+    """Owned attribute of a class"""
+    id: str
+    name: str
+    type: str
+
+
+@dataclass(slots=True)
+class AssociationEnd:
+    """Owned end of an association
+
+    Attributes:
+        class_id: identifier of the class at this end
+        navigable: raw `isNavigable` value, `"true"`, `"false"` or `""`
+    """
+    id: str
+    name: str
+    class_id: str
+    aggregation: str
+    navigable: str
+
+
+@dataclass(slots=True)
+class UMLClass:
+    """Class with its owned attributes and the ends of its owned associations"""
+    id: str
+    name: str
+    attributes: list[UMLAttribute] = field(default_factory=list)
+    ends: list[list[AssociationEnd]] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class UMLDataType:
+    """Data type"""
+    id: str
+    name: str
+
+
+@dataclass(slots=True)
+class UMLEnumeration:
+    """Enumeration with its literal names"""
+    id: str
+    name: str
+    literals: list[str] = field(default_factory=list)
+
+
+def new_attribute(id_: str, name: str, type_: str) -> UMLAttribute:
+    """Create an attribute with an interned type"""
+    return UMLAttribute(id_, name, intern(type_))
+
+
+def new_end(id_: str, name: str, class_id: str, aggregation: str, navigable: str
+) -> AssociationEnd:
+    """Create an association end with interned class id, aggregation and navigability"""
+    return AssociationEnd(id_, name, intern(class_id), intern(aggregation), intern(navigable))
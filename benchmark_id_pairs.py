@@ -0,0 +1,110 @@
+"""
+Measure ID pair and model lookups on a database filled with generated pairs.
+
+Usage:
+    python benchmark_id_pairs.py [--pairs 1000000] [--models 1000] [--without-indexes]
+        [--database-uri sqlite:////tmp/benchmark.sqlite]
+
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from sqlalchemy import insert, text
+from config import Config
+from app import create_app, db
+from app.models import IDPair, UMLModel, User
+from app.id_pairs_utils import find_class_id_for_table, find_table_id_for_class, load_pairs
+
+INDEXES = ('ix_id_pair_model_class', 'ix_id_pair_model_table', 'ix_uml_model_user_id')
+BATCH_SIZE = 50000
+
+
+def fill_database(pairs: int, models: int, users: int):
+    """Insert users, models and `pairs` ID pairs spread evenly over the models"""
+    db.session.execute(insert(User), [{
+        'name': f"user {index}", 'email': f"user{index}@example.com", '_password': "-"
+    } for index in range(users)])
+    db.session.execute(insert(UMLModel), [{
+        'database_url': "https://api.baserow.io", 'database_name': f"database {index}",
+        'baserow_token': "-", 'filename': "model.xmi", 'group_id': 1,
+        'user_id': index % users + 1
+    } for index in range(models)])
+
+    per_model = pairs // models
+    rows = ({'uml_model_id': index // per_model + 1,
+             'class_id': f"class-{index}",
+             'table_id': index + 1} for index in range(per_model * models))
+    while batch := [row for _, row in zip(range(BATCH_SIZE), rows)]:
+        db.session.execute(insert(IDPair), batch)
+    db.session.commit()
+
+
+def measure(name: str, lookup, arguments: list):
+    """Print mean and percentiles of the lookup latency in microseconds"""
+    timings = []
+    for args in arguments:
+        start = time.perf_counter()
+        lookup(*args)
+        timings.append((time.perf_counter() - start) * 1e6)
+        db.session.rollback()
+    timings.sort()
+    print(f"{name:<28} mean {statistics.mean(timings):>10.1f} us"
+          f"  p50 {timings[len(timings) // 2]:>10.1f} us"
+          f"  p99 {timings[int(len(timings) * 0.99)]:>10.1f} us")
+
+
+def main():
+    """Fill a new database and measure lookups"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pairs', type=int, default=1000000)
+    parser.add_argument('--models', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--lookups', type=int, default=1000)
+    parser.add_argument('--without-indexes', action='store_true')
+    parser.add_argument('--database-uri')
+    args = parser.parse_args()
+
+    path = None
+    if args.database_uri is None:
+        descriptor, path = tempfile.mkstemp(suffix=".sqlite")
+        os.close(descriptor)
+
+    class BenchmarkConfig(Config):
+        """Config of the benchmark database"""
+        SQLALCHEMY_DATABASE_URI = args.database_uri or f"sqlite:///{path}"
+
+    create_app(BenchmarkConfig)
+    try:
+        db.drop_all()
+        db.create_all()
+        if args.without_indexes:
+            for index in INDEXES:
+                db.session.execute(text(f"DROP INDEX {index}"))
+
+        start = time.perf_counter()
+        fill_database(args.pairs, args.models, args.users)
+        print(f"Inserted {args.pairs} pairs in {time.perf_counter() - start:.1f} s"
+              f" ({'without' if args.without_indexes else 'with'} indexes)")
+
+        per_model = args.pairs // args.models
+        samples = [random.randrange(per_model * args.models) for _ in range(args.lookups)]
+        measure("find_table_id_for_class", find_table_id_for_class,
+                [(index // per_model + 1, f"class-{index}") for index in samples])
+        measure("find_class_id_for_table", find_class_id_for_table,
+                [(index // per_model + 1, index + 1) for index in samples])
+        measure("load_pairs", load_pairs,
+                [(random.randrange(args.models) + 1,) for _ in range(args.lookups // 10)])
+        measure("models of user", lambda user_id: UMLModel.query.filter_by(
+            user_id=user_id).all(), [(random.randrange(args.users) + 1,) for _ in samples])
+    finally:
+        db.session.remove()
+        db.engine.dispose()
+        if path is not None:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
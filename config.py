@@ -1,4 +1,5 @@
 """Flask configuration"""
+import json
 import os
 from datetime import timedelta
 from dotenv import load_dotenv
@@ -15,6 +16,36 @@ class Config():
     STATIC_FOLDER = 'static'
     TEMPLATES_FOLDER = 'templates'
     UPLOAD_FOLDER = rf'{basedir}\files'
+    XMI_CACHE_SIZE = int(os.environ.get('XMI_CACHE_SIZE', 32))
+    # Shared by all workers when set, e.g. rf'{basedir}\cache'
+    XMI_CACHE_FOLDER = os.environ.get('XMI_CACHE_FOLDER')
+    # Extra UML type to Baserow field mappings, e.g. '{"money": {"type": "number"}}'
+    XMI_TYPE_MAPPINGS = json.loads(os.environ.get('XMI_TYPE_MAPPINGS', '{}'))
+    BASEROW_POOL_SIZE = int(os.environ.get('BASEROW_POOL_SIZE', 10))
+    BASEROW_KEEP_ALIVE = os.environ.get('BASEROW_KEEP_ALIVE', 'true').lower() == 'true'
+    # Requests per second and burst allowed by Baserow, retries of throttled requests
+    BASEROW_RATE_LIMIT = float(os.environ.get('BASEROW_RATE_LIMIT', 10))
+    BASEROW_BURST = int(os.environ.get('BASEROW_BURST', 20))
+    BASEROW_MAX_RETRIES = int(os.environ.get('BASEROW_MAX_RETRIES', 5))
+    BASEROW_BACKOFF = float(os.environ.get('BASEROW_BACKOFF', 0.5))
+    # Number of Baserow calls run at the same time while generating a database
+    GENERATION_WORKERS = int(os.environ.get('GENERATION_WORKERS', 8))
+    # Seconds per Baserow call used to estimate generation before any call was measured
+    BASEROW_ESTIMATED_LATENCY = float(os.environ.get('BASEROW_ESTIMATED_LATENCY', 0.3))
+    # Keep a copy of every generated database and clone it for the same XMI file and group
+    DATABASE_TEMPLATES = os.environ.get('DATABASE_TEMPLATES', 'false').lower() == 'true'
+    # Seconds to wait for Baserow to clone a database template
+    DATABASE_TEMPLATE_TIMEOUT = float(os.environ.get('DATABASE_TEMPLATE_TIMEOUT', 300))
+    # Seconds table ids of a database are reused by data endpoints before listing tables again
+    TABLE_DIRECTORY_TTL = float(os.environ.get('TABLE_DIRECTORY_TTL', 300))
+    # Number of batch requests sent at the same time by one call of a batch row endpoint
+    ROW_BATCH_WORKERS = int(os.environ.get('ROW_BATCH_WORKERS', 4))
+    # Number of pages fetched ahead while an export writes out the current page
+    EXPORT_PREFETCH_PAGES = int(os.environ.get('EXPORT_PREFETCH_PAGES', 4))
+    # Number of file imports running in the background at the same time
+    IMPORT_JOBS = int(os.environ.get('IMPORT_JOBS', 1))
+    # Number of databases generated in the background at the same time
+    GENERATION_JOBS = int(os.environ.get('GENERATION_JOBS', 2))
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(
         days=int(os.environ.get('ACCESS_TOKEN_EXPIRES_DAYS', 2))
     )
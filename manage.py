@@ -1,10 +1,12 @@
 """Run deployment tasks."""
 from app import create_app, db
+from app.migrations import upgrade_database
 # from flask_migrate import upgrade, migrate, init, stamp
 
 app = create_app('config.DevelopmentConfig')
 app.app_context().push()
 db.create_all()
+upgrade_database()
 
 # def migrate_app():
 #     """Migrate database to latest revision"""
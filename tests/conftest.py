@@ -0,0 +1,42 @@
+"""Fixtures of an application with an empty database"""
+import pytest
+from flask_jwt_extended import create_access_token
+import config
+from app import create_app, db
+from app.models import User
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    """Returns an application with a new SQLite database"""
+    directory = tmp_path_factory.mktemp("app")
+
+    class TestConfig(config.DevelopmentConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{directory / 'test.sqlite'}"
+        UPLOAD_FOLDER = str(directory)
+        JWT_SECRET_KEY = "test-secret-key-of-at-least-32-bytes"
+
+    test_app = create_app(TestConfig)
+    with test_app.app_context():
+        db.create_all()
+        yield test_app
+        db.session.remove()
+
+
+@pytest.fixture(scope='module')
+def user(app):
+    """Returns a registered user"""
+    user = User(name="test", email="test@example.com")
+    user.password = "password"
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def client(app, user):
+    """Returns a test client with the user's access token"""
+    test_client = app.test_client()
+    test_client.environ_base['HTTP_AUTHORIZATION'] = \
+        f"Bearer {create_access_token(identity=user.id)}"
+    return test_client
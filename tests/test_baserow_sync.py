@@ -0,0 +1,262 @@
+"""Tests of planning the changes a sync makes to an existing database"""
+from app import db
+from app.baserow_sync import plan_changes
+from app.models import GenerationJob, UMLModel
+from app.xmi_reader import UMLClass
+
+AGE = {'name': "Age", 'type': "number", 'number_decimal_places': 0, 'number_negative': True}
+
+
+def model():
+    """Returns classes, attributes, associations and id pairs of a model with
+    people and their pets"""
+    classes = {'c1': UMLClass('c1', "Person"), 'c2': UMLClass('c2', "Pet")}
+    attributes = {'c1': [dict(AGE)], 'c2': []}
+    associations = {
+        'c1': [{'name': "Pets", 'class_name': "pet", 'class_id': 'c2'}],
+        'c2': [],
+    }
+    pairs = {'c1': 1, 'c2': 2}
+    return classes, attributes, associations, pairs
+
+
+def database():
+    """Returns tables and fields of the database generated from `model`"""
+    live_tables = [{'id': 1, 'name': "person"}, {'id': 2, 'name': "pet"}]
+    live_fields = {
+        1: [
+            {'id': 10, 'name': "Primary key", 'type': "text", 'primary': True},
+            {'id': 11, **AGE},
+            {'id': 12, 'name': "Pets", 'type': "link_row", 'link_row_table_id': 2,
+             'link_row_related_field_id': 20},
+        ],
+        2: [
+            {'id': 20, 'name': "person", 'type': "link_row", 'link_row_table_id': 1,
+             'link_row_related_field_id': 12},
+            {'id': 21, 'name': "Primary key", 'type': "text", 'primary': True},
+        ],
+    }
+    return live_tables, live_fields
+
+
+def actions(changes: list[dict]) -> list[tuple]:
+    """Returns the action and class of every change"""
+    return [(change['action'], change['class_id']) for change in changes]
+
+
+def apply(changes: list[dict], classes, pairs, live_tables, live_fields):
+    """Change the tables and fields the way Baserow would"""
+    next_id = [100]
+
+    def new_id():
+        next_id[0] += 1
+        return next_id[0]
+
+    for change in changes:
+        action = change['action']
+        table_id = pairs.get(change['class_id'])
+        if action == "delete_table":
+            live_tables[:] = [table for table in live_tables if table['id'] != table_id]
+            del live_fields[table_id]
+            del pairs[change['class_id']]
+        elif action == "create_table":
+            table_id = new_id()
+            pairs[change['class_id']] = table_id
+            live_tables.append({'id': table_id, 'name': change['name']})
+            live_fields[table_id] = [
+                {'id': new_id(), 'name': "Primary key", 'type': "text", 'primary': True},
+                *({'id': new_id(), 'name': name, 'type': "text"}
+                  for name in change['field_names'])]
+        elif action == "rename_table":
+            for table in live_tables:
+                if table['id'] == table_id:
+                    table['name'] = change['name']
+        elif action == "update_field":
+            for field in live_fields[table_id]:
+                if field['id'] == change['field_id']:
+                    field.clear()
+                    field.update({'id': change['field_id'], **change['field']})
+        elif action == "delete_field":
+            live_fields[table_id][:] = [
+                field for field in live_fields[table_id] if field['id'] != change['field_id']]
+        elif action == "create_field":
+            live_fields[table_id].append({'id': new_id(), **change['field']})
+        elif action == "create_link":
+            association = change['association']
+            target_id = pairs[association['class_id']]
+            field_id, related_id = new_id(), new_id()
+            live_fields[table_id].append({
+                'id': field_id, 'type': "link_row",
+                'name': association['name'] or association['class_name'],
+                'link_row_table_id': target_id, 'link_row_related_field_id': related_id})
+            live_fields[target_id].append({
+                'id': related_id, 'type': "link_row",
+                'name': classes[change['class_id']].name.lower(),
+                'link_row_table_id': table_id, 'link_row_related_field_id': field_id})
+
+
+def test_unchanged_model_has_no_changes():
+    classes, attributes, associations, pairs = model()
+    assert plan_changes(classes, attributes, associations, pairs, *database()) == []
+
+
+def test_renamed_class_renames_its_table():
+    classes, attributes, associations, pairs = model()
+    classes['c2'] = UMLClass('c2', "Animal")
+
+    changes = plan_changes(classes, attributes, associations, pairs, *database())
+
+    assert changes == [
+        {'action': "rename_table", 'class_id': 'c2', 'table_id': 2, 'name': "animal"}]
+
+
+def test_renamed_attribute_replaces_its_field():
+    classes, attributes, associations, pairs = model()
+    attributes['c1'] = [{**AGE, 'name': "Years"}]
+
+    changes = plan_changes(classes, attributes, associations, pairs, *database())
+
+    assert changes == [
+        {'action': "delete_field", 'class_id': 'c1', 'field_id': 11, 'name': "Age"},
+        {'action': "create_field", 'class_id': 'c1', 'field': {**AGE, 'name': "Years"}},
+    ]
+
+
+def test_changed_type_updates_the_field():
+    classes, attributes, associations, pairs = model()
+    attributes['c1'] = [{'name': "Age", 'type': "text"}]
+
+    changes = plan_changes(classes, attributes, associations, pairs, *database())
+
+    assert changes == [{'action': "update_field", 'class_id': 'c1', 'field_id': 11,
+                        'field': {'name': "Age", 'type': "text"}}]
+
+
+def test_properties_baserow_does_not_return_are_unchanged():
+    classes, attributes, associations, pairs = model()
+    live_tables, live_fields = database()
+    created_on = {'name': "Added", 'type': "created_on", 'date_format': "EU",
+                  'date_include_time': True}
+    live_fields[2].append({'id': 22, **created_on, 'date_force_timezone': None})
+    attributes['c2'] = [{**created_on, 'timezone': "Europe/Zagreb"}]
+
+    assert plan_changes(classes, attributes, associations, pairs, live_tables, live_fields) == []
+
+
+def test_changed_select_options_keep_their_ids():
+    classes, attributes, associations, pairs = model()
+    live_tables, live_fields = database()
+    live_fields[2].append({'id': 22, 'name': "Kind", 'type': "single_select",
+                           'select_options': [{'id': 5, 'value': "cat", 'color': "blue"}]})
+    attributes['c2'] = [{'name': "Kind", 'type': "single_select", 'select_options': [
+        {'value': "cat", 'color': "red"}, {'value': "dog", 'color': "red"}]}]
+
+    changes = plan_changes(classes, attributes, associations, pairs, live_tables, live_fields)
+
+    assert actions(changes) == [("update_field", 'c2')]
+    assert changes[0]['field']['select_options'] == [
+        {'id': 5, 'value': "cat", 'color': "blue"}, {'value': "dog", 'color': "red"}]
+
+
+def test_added_attribute_and_class_are_created():
+    classes, attributes, associations, pairs = model()
+    classes['c3'] = UMLClass('c3', "Vet")
+    attributes['c1'].append({'name': "Note", 'type': "long_text"})
+    attributes['c3'] = [{'name': "Name", 'type': "text"}, dict(AGE)]
+    associations['c3'] = [{'name': "", 'class_name': "pet", 'class_id': 'c2'}]
+
+    changes = plan_changes(classes, attributes, associations, pairs, *database())
+
+    assert changes == [
+        {'action': "create_table", 'class_id': 'c3', 'name': "vet", 'field_names': ["Name"]},
+        {'action': "create_field", 'class_id': 'c1',
+         'field': {'name': "Note", 'type': "long_text"}},
+        {'action': "create_field", 'class_id': 'c3', 'field': AGE},
+        {'action': "create_link", 'class_id': 'c3', 'association': associations['c3'][0]},
+    ]
+
+
+def test_removed_attribute_and_class_are_deleted():
+    classes, attributes, associations, pairs = model()
+    del classes['c2']
+    attributes['c1'] = []
+    associations['c1'] = []
+
+    changes = plan_changes(classes, attributes, associations, pairs, *database())
+
+    # The link to the deleted table is removed by Baserow together with the table
+    assert changes == [
+        {'action': "delete_table", 'class_id': 'c2', 'table_id': 2, 'name': "pet"},
+        {'action': "delete_field", 'class_id': 'c1', 'field_id': 11, 'name': "Age"},
+    ]
+
+
+def test_removed_association_deletes_one_end_of_the_link():
+    classes, attributes, associations, pairs = model()
+    associations['c1'] = []
+
+    changes = plan_changes(classes, attributes, associations, pairs, *database())
+
+    assert changes == [
+        {'action': "delete_field", 'class_id': 'c1', 'field_id': 12, 'name': "Pets"}]
+
+
+def test_table_deleted_in_baserow_is_created_again():
+    classes, attributes, associations, pairs = model()
+    live_tables, live_fields = database()
+    live_tables.pop()
+    del live_fields[2]
+
+    changes = plan_changes(classes, attributes, associations, pairs, live_tables, live_fields)
+
+    assert ("create_table", 'c2') in actions(changes)
+
+
+def test_second_sync_has_no_changes():
+    classes, attributes, associations, pairs = model()
+    live_tables, live_fields = database()
+    classes['c2'] = UMLClass('c2', "Animal")
+    classes['c3'] = UMLClass('c3', "Vet")
+    attributes['c1'] = [{'name': "Years", 'type': "text"}]
+    attributes['c2'] = [{'name': "Kind", 'type': "text"}]
+    attributes['c3'] = [{'name': "Name", 'type': "text"}, dict(AGE)]
+    associations['c3'] = [{'name': "Patients", 'class_name': "animal", 'class_id': 'c2'}]
+
+    changes = plan_changes(classes, attributes, associations, pairs, live_tables, live_fields)
+    apply(changes, classes, pairs, live_tables, live_fields)
+
+    assert changes
+    assert plan_changes(classes, attributes, associations, pairs, live_tables, live_fields) == []
+
+
+def new_model(user, *jobs: tuple[str, str]) -> UMLModel:
+    """Returns a model with a database and jobs of the given kind and status"""
+    model = UMLModel(database_url="http://baserow.test", database_name="test",
+                     baserow_token="token", filename="test.xmi", group_id=1,
+                     database_id=1, user_id=user.id)
+    db.session.add(model)
+    db.session.flush()
+    for kind, status in jobs:
+        db.session.add(GenerationJob(uml_model_id=model.id, kind=kind, status=status))
+    db.session.commit()
+    return model
+
+
+def test_sync_after_failed_generation_is_refused(client, user):
+    model = new_model(user, ('generation', 'failed'))
+
+    response = client.post(f"/api/v1/models/{model.id}/sync")
+
+    assert response.status_code == 409
+    assert "/resume" in response.json['msg']
+    assert GenerationJob.query.filter_by(uml_model_id=model.id).count() == 1
+
+
+def test_resume_without_job_is_refused(client, user):
+    model = new_model(user)
+
+    response = client.post(f"/api/v1/models/{model.id}/resume")
+
+    assert response.status_code == 409
+    assert GenerationJob.query.filter_by(uml_model_id=model.id).count() == 0
+    assert db.session.get(UMLModel, model.id).database_id == 1
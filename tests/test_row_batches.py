@@ -0,0 +1,66 @@
+"""Tests of sending rows with Baserow's batch endpoints"""
+from app.row_batches import send_chunk
+
+
+class Response:
+    """Response of a batch endpoint"""
+    def __init__(self, status_code: int, body: dict):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+def batch_endpoint(*responses: Response):
+    """Returns a sender answering with the given responses and the sent batches"""
+    sent = []
+    answers = iter(responses)
+
+    def send(items: list):
+        sent.append(items)
+        return next(answers)
+    return send, sent
+
+
+def validation_error(*positions: int) -> Response:
+    """Returns a rejected batch with errors of the items at the given positions"""
+    return Response(400, {'error': "ERROR_REQUEST_BODY_VALIDATION", 'detail': {'items': {
+        str(position): {'field_1': [{'error': "Invalid", 'code': "invalid"}]}
+        for position in positions}}})
+
+
+def test_only_valid_items_are_sent_again():
+    items = [{'field_1': value} for value in ("a", "bad", "c", "bad")]
+    send, sent = batch_endpoint(
+        validation_error(1, 3),
+        Response(200, {'items': [{'id': 1}, {'id': 2}]}))
+
+    results = send_chunk(send, items, 10)
+
+    assert sent == [items, [items[0], items[2]]]
+    assert [result['index'] for result in results] == [10, 11, 12, 13]
+    assert [result.get('row') for result in results] == [{'id': 1}, None, {'id': 2}, None]
+    assert results[1]['error'] == {'error': "ERROR_REQUEST_BODY_VALIDATION", 'detail': {
+        'field_1': [{'error': "Invalid", 'code': "invalid"}]}}
+
+
+def test_batch_of_invalid_items_is_sent_once():
+    items = [{'field_1': "bad"}] * 200
+    send, sent = batch_endpoint(validation_error(*range(200)))
+
+    results = send_chunk(send, items, 0)
+
+    assert len(sent) == 1
+    assert all(result['status'] == 400 for result in results)
+
+
+def test_missing_table_is_reported_for_every_item():
+    error = {'error': "ERROR_TABLE_DOES_NOT_EXIST"}
+    send, sent = batch_endpoint(Response(404, error))
+
+    results = send_chunk(send, [{'field_1': "a"}, {'field_1': "b"}], 0)
+
+    assert len(sent) == 1
+    assert results == [{'index': 0, 'status': 404, 'error': error},
+                       {'index': 1, 'status': 404, 'error': error}]
@@ -0,0 +1,49 @@
+"""Tests of streaming rows of Baserow tables"""
+import json
+import pytest
+from app.exc import BadRequestException
+from app.row_export import PAGE_SIZE, export_table
+
+
+def table(rows: int, failing_page: int | None = None):
+    """Returns a function getting pages of a table with the given number of rows"""
+    def get(path: str, params: dict | None = None):
+        if path.startswith("database/fields/"):
+            return [{'name': "Name"}]
+        if params['page'] == failing_page:
+            raise BadRequestException({'error': "ERROR_SERVER"}, 500)
+        start = (params['page'] - 1) * PAGE_SIZE
+        return {'count': rows, 'results': [
+            {'id': id_, 'Name': f"row {id_}"}
+            for id_ in range(start + 1, min(rows, start + PAGE_SIZE) + 1)]}
+    return get
+
+
+def test_ndjson_export_has_every_row():
+    lines = "".join(export_table(table(450), 1, 'ndjson')).splitlines()
+
+    assert [json.loads(line)['id'] for line in lines] == list(range(1, 451))
+
+
+def test_failing_page_ends_ndjson_export_with_error():
+    lines = export_table(table(450, failing_page=3), 1, 'ndjson')
+    written = []
+
+    with pytest.raises(BadRequestException):
+        for line in lines:
+            written.append(line)
+
+    records = [json.loads(line) for line in "".join(written).splitlines()]
+    assert len(records) == 2 * PAGE_SIZE + 1
+    assert records[-1] == {'error': {'error': "ERROR_SERVER"}, 'status': 500}
+
+
+def test_failing_page_aborts_csv_export():
+    lines = export_table(table(450, failing_page=2), 1, 'csv')
+    written = []
+
+    with pytest.raises(BadRequestException):
+        for line in lines:
+            written.append(line)
+
+    assert "".join(written).splitlines()[-1] == f"{PAGE_SIZE},row {PAGE_SIZE}"